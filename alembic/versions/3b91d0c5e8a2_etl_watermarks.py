@@ -0,0 +1,41 @@
+"""ETL watermarks
+
+Creates etl_watermarks, the newest item loaded per account, for databases
+whose volume was initialised before backend/db/init/002_etl_watermarks.sql
+existed. Every statement is idempotent so it is safe on databases created
+from either.
+
+Revision ID: 3b91d0c5e8a2
+Revises: a7c4e2d91f36
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b91d0c5e8a2'
+down_revision: Union[str, Sequence[str], None] = 'a7c4e2d91f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS etl_watermarks (
+            platform TEXT NOT NULL,
+            account_id TEXT NOT NULL,
+            last_seen_at TIMESTAMPTZ NOT NULL,
+            cursor TEXT,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (platform, account_id)
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS etl_watermarks")
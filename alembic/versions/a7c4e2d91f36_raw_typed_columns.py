@@ -0,0 +1,107 @@
+"""Typed hot columns on the ETL raw tables
+
+Adds the columns the ETL loader now extracts from each payload and backfills
+them from raw_json for rows loaded before. Mirrors
+backend/db/init/004_raw_typed_columns.sql; every statement is idempotent so
+it is safe on databases created from either.
+
+Instagram media payloads do not name their owner, so account_id is backfilled
+from post_analytics where the post is known there. Remaining rows are filled
+by the loader the next time the ETL re-reads them (within ETL_REFETCH_DAYS, or
+run it once with full_refresh=True for the whole history).
+
+Revision ID: a7c4e2d91f36
+Revises: 87fb2a400493
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e2d91f36'
+down_revision: Union[str, Sequence[str], None] = '87fb2a400493'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = {
+    'raw_instagram_posts': [
+        ('account_id', 'TEXT'),
+        ('caption', 'TEXT'),
+        ('media_type', 'TEXT'),
+        ('like_count', 'BIGINT'),
+        ('comments_count', 'BIGINT'),
+        ('posted_at', 'TIMESTAMPTZ'),
+    ],
+    'raw_youtube_stats': [
+        ('account_id', 'TEXT'),
+        ('title', 'TEXT'),
+        ('media_type', 'TEXT'),
+        ('like_count', 'BIGINT'),
+        ('comments_count', 'BIGINT'),
+        ('view_count', 'BIGINT'),
+        ('posted_at', 'TIMESTAMPTZ'),
+    ],
+}
+
+
+BACKFILL = {
+    'raw_instagram_posts': """
+        UPDATE raw_instagram_posts SET
+            caption = raw_json->>'caption',
+            media_type = raw_json->>'media_type',
+            like_count = (raw_json->>'like_count')::bigint,
+            comments_count = (raw_json->>'comments_count')::bigint,
+            posted_at = (raw_json->>'timestamp')::timestamptz
+        WHERE posted_at IS NULL
+    """,
+    'raw_youtube_stats': """
+        UPDATE raw_youtube_stats SET
+            account_id = raw_json->'snippet'->>'channelId',
+            title = raw_json->'snippet'->>'title',
+            media_type = replace(raw_json->'id'->>'kind', 'youtube#', ''),
+            like_count = (raw_json->'statistics'->>'likeCount')::bigint,
+            comments_count = (raw_json->'statistics'->>'commentCount')::bigint,
+            view_count = (raw_json->'statistics'->>'viewCount')::bigint,
+            posted_at = (raw_json->'snippet'->>'publishedAt')::timestamptz
+        WHERE posted_at IS NULL
+    """,
+}
+
+
+# Instagram owners of posts the app already knows about
+INSTAGRAM_ACCOUNT_BACKFILL = """
+    UPDATE raw_instagram_posts r SET account_id = sa.account_id
+    FROM post_analytics pa
+    JOIN social_accounts sa ON sa.id = pa.account_id AND sa.platform = 'instagram'
+    WHERE pa.post_id = r.post_id AND r.account_id IS NULL
+"""
+
+
+def _existing_tables():
+    # The raw tables are created by backend/db/init, not by these migrations
+    return set(sa.inspect(op.get_bind()).get_table_names()) & set(COLUMNS)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    for table in _existing_tables():
+        for name, type_ in COLUMNS[table]:
+            op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {type_}")
+        op.execute(BACKFILL[table])
+        if table == 'raw_instagram_posts' and {'post_analytics', 'social_accounts'} <= tables:
+            op.execute(INSTAGRAM_ACCOUNT_BACKFILL)
+        op.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_account_posted_at ON {table} (account_id, posted_at)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in _existing_tables():
+        op.execute(f"DROP INDEX IF EXISTS idx_{table}_account_posted_at")
+        for name, _ in COLUMNS[table]:
+            op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS {name}")
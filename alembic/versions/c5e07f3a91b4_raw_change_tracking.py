@@ -0,0 +1,71 @@
+"""Change tracking on the ETL raw tables
+
+Adds content_hash and loaded_at to the raw tables and creates the
+partitioned post_metric_snapshots table, for databases whose volume was
+initialised before backend/db/init/003_post_metric_snapshots.sql existed.
+Every statement is idempotent so it is safe on databases created from either.
+
+Rows loaded before this migration get loaded_at = now() and no content hash,
+so the next ETL run rewrites them once and incremental dbt models pick them
+up on their next run.
+
+Revision ID: c5e07f3a91b4
+Revises: 3b91d0c5e8a2
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e07f3a91b4'
+down_revision: Union[str, Sequence[str], None] = '3b91d0c5e8a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+RAW_TABLES = ('raw_instagram_posts', 'raw_youtube_stats')
+
+
+def _existing_tables():
+    # The raw tables are created by backend/db/init, not by these migrations
+    return set(sa.inspect(op.get_bind()).get_table_names()) & set(RAW_TABLES)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in _existing_tables():
+        op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS content_hash TEXT")
+        op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()")
+
+    # Daily partitions are created by the ETL loader before it writes to them
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS post_metric_snapshots (
+            platform TEXT NOT NULL,
+            post_id TEXT NOT NULL,
+            observed_at TIMESTAMPTZ NOT NULL,
+            likes BIGINT,
+            comments BIGINT,
+            views BIGINT
+        ) PARTITION BY RANGE (observed_at)
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_post_metric_snapshots_observed_at
+        ON post_metric_snapshots USING BRIN (observed_at)
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_post_metric_snapshots_post
+        ON post_metric_snapshots (platform, post_id, observed_at)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Drops every daily partition with it
+    op.execute("DROP TABLE IF EXISTS post_metric_snapshots")
+    for table in _existing_tables():
+        op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS loaded_at")
+        op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS content_hash")
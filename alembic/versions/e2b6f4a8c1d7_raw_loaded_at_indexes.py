@@ -0,0 +1,42 @@
+"""loaded_at indexes on the ETL raw tables
+
+The incremental staging models select raw rows by loaded_at. The index names
+match the ones the staging models used to create themselves, so databases
+that already have them are left unchanged.
+
+Revision ID: e2b6f4a8c1d7
+Revises: c5e07f3a91b4
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b6f4a8c1d7'
+down_revision: Union[str, Sequence[str], None] = 'c5e07f3a91b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+RAW_TABLES = ('raw_instagram_posts', 'raw_youtube_stats')
+
+
+def _existing_tables():
+    # The raw tables are created by backend/db/init, not by these migrations
+    return set(sa.inspect(op.get_bind()).get_table_names()) & set(RAW_TABLES)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in _existing_tables():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {table}_loaded_at_idx ON {table} (loaded_at)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in _existing_tables():
+        op.execute(f"DROP INDEX IF EXISTS {table}_loaded_at_idx")
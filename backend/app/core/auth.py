@@ -7,19 +7,48 @@ Used by the authentication routes for secure user management.
 Functions:
 - hash_password: Hash a plain password using bcrypt
 - verify_password: Verify a password against its hash
+- verify_and_update_password: Verify a password and rehash it if the cost changed
+- hash_password_async / verify_and_update_password_async: Same, run in the hashing process pool
+- init_hash_pool / shutdown_hash_pool: Start and stop the hashing process pool
+  (called from the application lifespan)
 - create_access_token: Generate a JWT token for authentication
 - decode_access_token: Decode and validate a JWT token
+- decode_access_token_cached: Same, remembering verified claims until the token expires
+- jwt_cache_stats: Size and hit/miss counters of the verified-token cache
+- get_current_user_id: FastAPI dependency resolving the user from the bearer token
 """
 
+import asyncio
+import hashlib
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from passlib.context import CryptContext
+from backend.app.core.ttl_cache import MISSING, TTLCache
 
 # Password hashing configuration
-# Using bcrypt algorithm for secure password storage
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Using bcrypt algorithm for secure password storage. Hashes made with a
+# different cost are reported by pwd_context.needs_update and rehashed on login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt is CPU-bound, so it runs in a dedicated, size-limited process pool.
+# Jobs beyond PASSWORD_HASH_MAX_PENDING (running + queued) are refused.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", PASSWORD_HASH_WORKERS * 4))
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_pending_hash_jobs = 0
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing pool already has PASSWORD_HASH_MAX_PENDING jobs"""
 
 # JWT configuration
 # Load from environment variables for security
@@ -27,6 +56,11 @@ JWT_SECRET = os.getenv("JWT_SECRET", "your_secret_key_change_this_in_production"
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24  # Tokens expire after 24 hours
 
+# Verified claims keyed by token digest; each entry expires at the token's own exp
+_verified_tokens = TTLCache(maxsize=int(os.getenv("JWT_CACHE_SIZE", 10000)), ttl=0)
+
+_bearer_scheme = HTTPBearer(auto_error=False)
+
 
 def hash_password(password: str) -> str:
     """
@@ -61,6 +95,89 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and produce a new hash if the stored one is outdated
+    
+    Args:
+        plain_password: Plain text password to verify
+        hashed_password: Stored hashed password
+        
+    Returns:
+        (is_valid, new_hash) where new_hash is None unless the stored hash
+        was made with a different bcrypt cost and should be replaced
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def init_hash_pool():
+    """
+    Start the hashing process pool (idempotent)
+
+    Workers are spawned rather than forked: forking the server, which already
+    runs threads (event loop, connection pools), can leave a child deadlocked
+    on a lock that was held at fork time.
+    """
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _hash_pool
+
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    # Started by the lifespan; scripts using the async helpers start it here
+    return _hash_pool or init_hash_pool()
+
+
+async def _run_in_hash_pool(fn, *args):
+    global _pending_hash_jobs
+    if _pending_hash_jobs >= PASSWORD_HASH_MAX_PENDING:
+        raise PasswordHashingBusy()
+    _pending_hash_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_pool(), fn, *args)
+    finally:
+        _pending_hash_jobs -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hash a password in the hashing process pool
+    
+    Raises:
+        PasswordHashingBusy: If the pool's queue is full
+        
+    Example:
+        hashed = await hash_password_async("mypassword123")
+    """
+    return await _run_in_hash_pool(hash_password, password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify (and possibly rehash) a password in the hashing process pool
+    
+    Raises:
+        PasswordHashingBusy: If the pool's queue is full
+        
+    Example:
+        is_valid, new_hash = await verify_and_update_password_async(password, stored_hash)
+    """
+    return await _run_in_hash_pool(verify_and_update_password, plain_password, hashed_password)
+
+
+def shutdown_hash_pool():
+    """Stop the hashing process pool, if it was started"""
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
     Create a JWT access token
@@ -116,3 +233,70 @@ def decode_access_token(token: str):
     except jwt.InvalidTokenError:
         # Token is invalid
         return None
+
+
+def decode_access_token_cached(token: str):
+    """
+    Decode and validate a JWT token, caching the verified claims
+    
+    The signature is checked once per token; later calls return the cached
+    claims until the token's exp. Invalid tokens are never cached.
+    
+    Args:
+        token: JWT token string
+        
+    Returns:
+        Decoded token payload dict, or None if invalid/expired
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _verified_tokens.get(key)
+    if payload is not MISSING:
+        return payload
+    
+    payload = decode_access_token(token)
+    if payload is None or "exp" not in payload:
+        return payload
+    
+    # Convert the wall-clock exp into the cache's monotonic clock
+    remaining = payload["exp"] - time.time()
+    if remaining > 0:
+        _verified_tokens.set(key, payload, expires_at=time.monotonic() + remaining)
+    return payload
+
+
+def jwt_cache_stats() -> dict:
+    """Size and hit/miss counters of the verified-token cache"""
+    return _verified_tokens.stats()
+
+
+async def get_current_user_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer_scheme),
+) -> int:
+    """
+    FastAPI dependency returning the authenticated user's ID
+    
+    Reads the `Authorization: Bearer <jwt>` header and verifies the token.
+    
+    Raises:
+        HTTPException 401: If the header is missing or the token is invalid/expired
+        
+    Example:
+        @router.get('/me')
+        async def me(user_id: int = Depends(get_current_user_id)):
+            ...
+    """
+    if credentials is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    payload = decode_access_token_cached(credentials.credentials)
+    if not payload or "user_id" not in payload:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload["user_id"]
@@ -0,0 +1,197 @@
+"""
+Social Response Cache
+
+This module caches /social/* responses in Redis so page views do not hit the
+upstream platform APIs every time, and /analytics/* responses so they do not
+query the ETL's tables on every view. Entries are keyed per (user_id, platform,
+endpoint) and served stale-while-revalidate: once an entry is older than its
+TTL it is still returned, and a background task refreshes it.
+
+Functions:
+- cache_key: Build the Redis key for a cached response
+- cached_response: Return a cached response, fetching or refreshing it as needed
+- invalidate_social_cache / invalidate_social_cache_async: Drop every cached
+  response for a user's platform
+
+Configuration (environment variables):
+- SOCIAL_CACHE_TTL_<PLATFORM>_<ENDPOINT>: Fresh lifetime in seconds, e.g.
+  SOCIAL_CACHE_TTL_YOUTUBE_ANALYTICS=900
+- SOCIAL_CACHE_STALE_SECONDS: How long past its TTL a stale entry may be served
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable
+
+import redis
+from backend.app.core.metrics import CACHE_LOOKUPS
+from backend.app.core.redis import get_async_redis, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Default fresh lifetime (seconds) per (platform, endpoint)
+CACHE_TTLS = {
+    ("instagram", "insights"): 300,
+    ("twitter", "tweets"): 120,
+    ("youtube", "videos"): 600,
+    ("youtube", "analytics"): 600,
+    # Heatmaps only change when the nightly ETL runs
+    ("instagram", "best_time"): 3600,
+    ("youtube", "best_time"): 3600,
+}
+
+# Only one worker refreshes a stale entry at a time
+REFRESH_LOCK_SECONDS = 30
+
+# Keep references to background refreshes so they are not garbage collected
+_refresh_tasks = set()
+
+
+def cache_key(user_id: int, platform: str, endpoint: str) -> str:
+    """Redis key for one cached (user, platform, endpoint) response"""
+    return f"social:{user_id}:{platform}:{endpoint}"
+
+
+def _ttl(platform: str, endpoint: str) -> int:
+    default = CACHE_TTLS.get((platform, endpoint), 300)
+    return int(os.getenv(f"SOCIAL_CACHE_TTL_{platform.upper()}_{endpoint.upper()}", default))
+
+
+def _stale_seconds() -> int:
+    return int(os.getenv("SOCIAL_CACHE_STALE_SECONDS", 3600))
+
+
+async def _read(key: str):
+    raw = await get_async_redis().get(key)
+    return json.loads(raw) if raw else None
+
+
+async def _write(key: str, data: Any, ttl: int):
+    entry = json.dumps({"fetched_at": time.time(), "data": data})
+    # Redis keeps the entry for the stale window too; freshness is checked on read
+    await get_async_redis().set(key, entry, ex=ttl + _stale_seconds())
+
+
+async def _claim_refresh(key: str) -> bool:
+    return bool(await get_async_redis().set(f"{key}:refresh", 1, nx=True, ex=REFRESH_LOCK_SECONDS))
+
+
+async def _store(key: str, data: Any, ttl: int):
+    try:
+        await _write(key, data, ttl)
+    except redis.RedisError as e:
+        logger.warning("Could not write cache entry %s: %s", key, e)
+
+
+async def _refresh(key: str, ttl: int, fetch: Callable[[], Awaitable[Any]]):
+    try:
+        if not await _claim_refresh(key):
+            return  # Another request is already refreshing this entry
+        data = await fetch()
+    except Exception as e:
+        logger.warning("Background refresh of %s failed: %s", key, e)
+        return
+    await _store(key, data, ttl)
+
+
+def _schedule_refresh(key: str, ttl: int, fetch: Callable[[], Awaitable[Any]]):
+    task = asyncio.create_task(_refresh(key, ttl, fetch))
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+async def cached_response(
+    user_id: int,
+    platform: str,
+    endpoint: str,
+    fetch: Callable[[], Awaitable[Any]]
+):
+    """
+    Return a cached response, fetching it from upstream on a miss
+
+    A fresh entry is returned as-is. A stale entry is returned immediately and
+    refreshed in the background. If Redis is unavailable the response is
+    fetched directly so the endpoint keeps working uncached.
+
+    Args:
+        user_id: User's ID
+        platform: Platform name (instagram, twitter, youtube)
+        endpoint: Endpoint name within the platform (e.g. insights)
+        fetch: Coroutine function that fetches the response from upstream
+
+    Returns:
+        The (possibly cached) response data
+
+    Example:
+        return await cached_response(user_id, "youtube", "videos", fetch_videos)
+    """
+    key = cache_key(user_id, platform, endpoint)
+    ttl = _ttl(platform, endpoint)
+
+    try:
+        entry = await _read(key)
+    except redis.RedisError as e:
+        logger.warning("Could not read cache entry %s: %s", key, e)
+        entry = None
+
+    if entry is None:
+        CACHE_LOOKUPS.inc((platform, endpoint, "miss"))
+        data = await fetch()
+        await _store(key, data, ttl)
+        return data
+
+    if time.time() - entry["fetched_at"] >= ttl:
+        CACHE_LOOKUPS.inc((platform, endpoint, "stale"))
+        _schedule_refresh(key, ttl, fetch)
+    else:
+        CACHE_LOOKUPS.inc((platform, endpoint, "hit"))
+
+    return entry["data"]
+
+
+def _platform_keys(user_id: int, platform: str):
+    return [
+        cache_key(user_id, platform, endpoint)
+        for (cached_platform, endpoint) in CACHE_TTLS
+        if cached_platform == platform
+    ]
+
+
+def invalidate_social_cache(user_id: int, platform: str):
+    """
+    Drop every cached response for a user's platform
+
+    Called when a social account's token changes so the next request fetches
+    fresh data with the new token.
+
+    Args:
+        user_id: User's ID
+        platform: Platform name (instagram, twitter, youtube)
+    """
+    keys = _platform_keys(user_id, platform)
+    if not keys:
+        return
+    try:
+        get_redis_client().delete(*keys)
+    except redis.RedisError as e:
+        logger.warning("Could not invalidate cache for user %s on %s: %s", user_id, platform, e)
+
+
+async def invalidate_social_cache_async(user_id: int, platform: str):
+    """
+    Drop every cached response for a user's platform (for async callers)
+
+    Args:
+        user_id: User's ID
+        platform: Platform name (instagram, twitter, youtube)
+    """
+    keys = _platform_keys(user_id, platform)
+    if not keys:
+        return
+    try:
+        await get_async_redis().delete(*keys)
+    except redis.RedisError as e:
+        logger.warning("Could not invalidate cache for user %s on %s: %s", user_id, platform, e)
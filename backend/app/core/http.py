@@ -0,0 +1,140 @@
+"""
+Upstream HTTP Clients
+
+This module owns the outbound HTTP clients used to talk to the social platforms.
+One pooled httpx.AsyncClient is created per upstream platform for the lifetime
+of the application, so requests reuse kept-alive TCP/TLS connections instead of
+paying a new handshake every time.
+
+Functions:
+- create_http_clients: Build one pooled client per upstream platform
+- close_http_clients: Close every client (called on application shutdown)
+- http_client: FastAPI dependency factory returning the client for a platform
+- http_clients: FastAPI dependency returning every platform's client
+
+Configuration (environment variables):
+- HTTP2_ENABLED: Negotiate HTTP/2 when the optional `h2` package is installed
+- HTTP_MAX_CONNECTIONS: Maximum open connections per upstream client
+- HTTP_MAX_KEEPALIVE_CONNECTIONS: Idle connections kept in each pool
+- HTTP_KEEPALIVE_EXPIRY: Seconds an idle connection is kept alive
+- HTTP_CONNECT_TIMEOUT: Seconds allowed to establish a connection
+- <PLATFORM>_HTTP_TIMEOUT: Read/write timeout for one platform, e.g. YOUTUBE_HTTP_TIMEOUT
+"""
+
+import logging
+import os
+from typing import Callable, Dict
+
+import httpx
+from fastapi import Request
+from backend.app.core.metrics import upstream_request_hook, upstream_response_hook
+from backend.app.core.rate_limit import request_hook, response_hook
+
+logger = logging.getLogger(__name__)
+
+# Upstream platforms and the default read timeout (seconds) for each one.
+# The youtube client is also used for the Google OAuth token exchange.
+UPSTREAM_TIMEOUTS = {
+    "instagram": 10.0,
+    "twitter": 10.0,
+    "youtube": 15.0,
+}
+
+
+def _http2_enabled() -> bool:
+    """Return True if HTTP/2 is requested and the `h2` package is available"""
+    if os.getenv("HTTP2_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+def _limits() -> httpx.Limits:
+    """Connection pool limits shared by every upstream client"""
+    return httpx.Limits(
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)),
+        keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30)),
+    )
+
+
+def _timeout(platform: str) -> httpx.Timeout:
+    """Per-platform timeout, overridable with <PLATFORM>_HTTP_TIMEOUT"""
+    default = UPSTREAM_TIMEOUTS[platform]
+    read_timeout = float(os.getenv(f"{platform.upper()}_HTTP_TIMEOUT", default))
+    connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+    return httpx.Timeout(read_timeout, connect=connect_timeout)
+
+
+def create_http_clients() -> Dict[str, httpx.AsyncClient]:
+    """
+    Create one pooled AsyncClient per upstream platform
+
+    Every client consults the outbound rate limiter (core/rate_limit.py) and
+    records upstream latency (core/metrics.py) through request/response event
+    hooks. The timing hook runs after the limiter, so time spent waiting for
+    quota is not counted as upstream latency.
+
+    Returns:
+        Dict mapping platform name to its AsyncClient
+    """
+    http2 = _http2_enabled()
+    return {
+        platform: httpx.AsyncClient(
+            http2=http2,
+            limits=_limits(),
+            timeout=_timeout(platform),
+            event_hooks={
+                "request": [request_hook(platform), upstream_request_hook(platform)],
+                "response": [upstream_response_hook(platform), response_hook(platform)],
+            },
+        )
+        for platform in UPSTREAM_TIMEOUTS
+    }
+
+
+async def close_http_clients(clients: Dict[str, httpx.AsyncClient]):
+    """
+    Close every upstream client and release its pooled connections
+
+    Args:
+        clients: Dict returned by create_http_clients
+    """
+    for client in clients.values():
+        await client.aclose()
+
+
+def http_client(platform: str) -> Callable[[Request], httpx.AsyncClient]:
+    """
+    Build a FastAPI dependency that returns the shared client for a platform
+
+    Args:
+        platform: Platform name (instagram, twitter, youtube)
+
+    Returns:
+        Dependency callable for use with Depends()
+
+    Example:
+        async def handler(client: httpx.AsyncClient = Depends(http_client("instagram"))):
+            res = await client.get(url)
+    """
+    if platform not in UPSTREAM_TIMEOUTS:
+        raise ValueError(f"Unknown upstream platform: {platform}")
+
+    def dependency(request: Request) -> httpx.AsyncClient:
+        return request.app.state.http_clients[platform]
+
+    return dependency
+
+
+def http_clients(request: Request) -> Dict[str, httpx.AsyncClient]:
+    """
+    FastAPI dependency returning the shared clients for every platform
+
+    Used by endpoints that fan out to several platforms at once.
+    """
+    return request.app.state.http_clients
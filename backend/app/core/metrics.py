@@ -0,0 +1,449 @@
+"""
+Request, Upstream and Database Metrics
+
+Lightweight in-process instrumentation, exposed in the Prometheus text format
+at /metrics. Recording a sample is a dict lookup, a bisect and a few additions
+under a lock, so it stays enabled in production.
+
+Each worker process keeps its own counters; Prometheus scrapes and sums them
+per instance like any multi-process exporter.
+
+What is measured:
+- MetricsMiddleware: latency histogram and status counts per route
+- upstream_request_hook / upstream_response_hook: httpx event hooks timing
+  every call to a platform API, per platform and endpoint
+- instrument_engine: SQLAlchemy cursor listeners counting and timing queries,
+  and pool listeners timing how long connections stay checked out
+- timed_pool_class: Queue pool recording how long checkouts wait for a connection
+- Per-request breakdown (DB and upstream time of the current request) used by
+  the slow-request log
+
+Functions:
+- render_metrics: Every metric in the Prometheus text exposition format
+- current_request_stats: Breakdown of the request being handled, if any
+
+Configuration (environment variables):
+- SLOW_REQUEST_SECONDS: Log requests slower than this with their breakdown
+  (unset or 0 disables the slow-request log)
+"""
+
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Finer low end for pool checkouts, which should normally take well under 1ms
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.0025) + LATENCY_BUCKETS
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def total(self) -> float:
+        """Sum over every label set"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram with a fixed set of label names"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def total(self) -> Tuple[int, float]:
+        """(observation count, sum of values) over every label set"""
+        with self._lock:
+            series = list(self._values.values())
+        return sum(sum(values[:-1]) for values in series), sum(values[-1] for values in series)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = [(labels, list(series)) for labels, series in self._values.items()]
+        for labels, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                bucket_labels = _labels(self.labelnames + ("le",), labels + (_number(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+def _number(value) -> str:
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+# ==================== Metrics ====================
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to handle an API request", ("method", "route"))
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "API requests by response status", ("method", "route", "status"))
+
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "upstream_request_duration_seconds", "Time until a platform API answered", ("platform", "endpoint"))
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total", "Platform API calls by response status", ("platform", "endpoint", "status"))
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Time to execute one SQL statement", ("statement",))
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Time to check out a pooled connection (waiting or connecting)", ("pool",),
+    buckets=POOL_WAIT_BUCKETS)
+DB_CONNECTION_HOLD = Histogram(
+    "db_connection_hold_seconds", "Time a pooled connection stayed checked out", ("pool",))
+
+CACHE_LOOKUPS = Counter(
+    "social_cache_lookups_total", "Social response cache lookups by result", ("platform", "endpoint", "result"))
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_calls_total", "Upstream fetches by how they were served", ("platform", "endpoint", "role"))
+
+
+# ==================== Per-Request Breakdown ====================
+
+class RequestStats:
+    """Where the time of one API request went"""
+
+    __slots__ = ("db_queries", "db_seconds", "pool_wait_seconds", "upstream_calls")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        # (platform, endpoint, status, seconds)
+        self.upstream_calls: List[Tuple[str, str, str, float]] = []
+
+    def summary(self) -> dict:
+        return {
+            "db_queries": self.db_queries,
+            "db_ms": round(self.db_seconds * 1000, 1),
+            "db_pool_wait_ms": round(self.pool_wait_seconds * 1000, 1),
+            "upstream": [
+                {"platform": platform, "endpoint": endpoint, "status": status, "ms": round(seconds * 1000, 1)}
+                for platform, endpoint, status, seconds in self.upstream_calls
+            ],
+        }
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Breakdown of the API request being handled, or None outside a request"""
+    return _request_stats.get()
+
+
+def _slow_request_seconds() -> float:
+    return float(os.getenv("SLOW_REQUEST_SECONDS", 0) or 0)
+
+
+def _route_template(scope) -> str:
+    """Matched route template (e.g. /social/youtube/videos), or "unmatched" """
+    # The router stores the matched route in the scope. Depending on the
+    # FastAPI version its path may omit the include_router prefix, so the
+    # prefix is recovered from the part of the URL the route did not match.
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    path = scope["path"]
+    regex = getattr(route, "path_regex", None)
+    if regex is None or regex.match(path):
+        return template
+    for index, char in enumerate(path):
+        if char == "/" and index and regex.match(path[index:]):
+            return path[:index] + template
+    return template
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and status of every HTTP request
+
+    Requests are labelled by their route template (e.g. /social/youtube/videos),
+    not the raw path, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.slow_seconds = _slow_request_seconds()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stats.reset(token)
+
+            route = _route_template(scope)
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.observe((method, route), elapsed)
+            HTTP_REQUESTS.inc((method, route, str(status)))
+
+            if self.slow_seconds and elapsed >= self.slow_seconds:
+                logger.warning(
+                    "Slow request %s %s: %.0fms status=%s breakdown=%s",
+                    method, scope["path"], elapsed * 1000, status, stats.summary(),
+                )
+
+
+# ==================== Upstream (httpx) ====================
+
+# Path segments that identify an object (numeric IDs, long opaque IDs)
+_ID_SEGMENT = re.compile(r"^(\d{4,}|(?=[\w-]*\d)[\w-]{16,})$")
+
+
+def upstream_endpoint(url: httpx.URL) -> str:
+    """Path of an upstream URL with object IDs replaced by {id}"""
+    segments = ["{id}" if _ID_SEGMENT.match(segment) else segment for segment in url.path.split("/")]
+    return "/".join(segments) or "/"
+
+
+def upstream_request_hook(platform: str):
+    """httpx request hook stamping the time an upstream call was sent"""
+    async def hook(request: httpx.Request):
+        request.extensions["metrics_started"] = time.perf_counter()
+    return hook
+
+
+def upstream_response_hook(platform: str):
+    """httpx response hook recording the latency and status of an upstream call"""
+    async def hook(response: httpx.Response):
+        started = response.request.extensions.get("metrics_started")
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        endpoint = upstream_endpoint(response.request.url)
+        status = str(response.status_code)
+
+        UPSTREAM_REQUEST_DURATION.observe((platform, endpoint), elapsed)
+        UPSTREAM_REQUESTS.inc((platform, endpoint, status))
+
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.upstream_calls.append((platform, endpoint, status, elapsed))
+    return hook
+
+
+# ==================== Database (SQLAlchemy) ====================
+
+# The start time lives on the statement's execution context, so a statement
+# that fails (no after_cursor_execute) leaves nothing behind on the connection
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    # Label by statement type (SELECT, INSERT, ...) to keep cardinality bounded
+    words = statement.split(None, 1)
+    DB_QUERY_DURATION.observe((words[0].upper() if words else "",), elapsed)
+
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_seconds += elapsed
+
+
+def instrument_engine(engine: Engine, pool_name: str):
+    """
+    Count and time every SQL statement run on an engine, and how long each
+    pooled connection stays checked out
+
+    For an AsyncEngine pass its sync_engine.
+
+    Args:
+        engine: Engine to instrument
+        pool_name: Label of the engine's pool in the metrics, e.g. "primary"
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["metrics_checked_out"] = time.perf_counter()
+
+    def checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("metrics_checked_out", None)
+        if started is not None:
+            DB_CONNECTION_HOLD.observe((pool_name,), time.perf_counter() - started)
+
+    event.listen(engine, "checkout", checkout)
+    event.listen(engine, "checkin", checkin)
+
+
+def timed_pool_class(base, pool_name: str):
+    """
+    Subclass of a queue pool class recording the wait of every checkout
+
+    Pass the result as create_engine(poolclass=...). The wait includes opening
+    a new connection when the pool has none idle.
+
+    Args:
+        base: QueuePool or AsyncAdaptedQueuePool
+        pool_name: Label of the pool in the metrics, e.g. "primary"
+    """
+    class TimedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                elapsed = time.perf_counter() - started
+                DB_POOL_WAIT.observe((pool_name,), elapsed)
+                stats = _request_stats.get()
+                if stats is not None:
+                    stats.pool_wait_seconds += elapsed
+
+    TimedPool.__name__ = TimedPool.__qualname__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+# ==================== Exposition ====================
+
+def _gauge(name: str, documentation: str, samples: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], float]) -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    for (names, values), value in samples.items():
+        lines.append(f"{name}{_labels(names, values)} {_number(value)}")
+    return lines
+
+
+def _cache_metrics() -> List[str]:
+    """Size (gauge) and hit/miss counters of the in-process caches"""
+    from backend.app.core.auth import jwt_cache_stats
+    from backend.app.db.crud import get_social_account_cache_stats
+
+    caches = (("social_account", get_social_account_cache_stats()), ("jwt", jwt_cache_stats()))
+    lines = _gauge(
+        "inprocess_cache_size", "Entries in each in-process cache",
+        {(("cache",), (cache,)): stats["size"] for cache, stats in caches},
+    )
+    # Hits and misses only grow, so they are counters that rate() can be applied to
+    for field in ("hits", "misses"):
+        name = f"inprocess_cache_{field}_total"
+        lines += [f"# HELP {name} In-process cache lookups that were {field}", f"# TYPE {name} counter"]
+        for cache, stats in caches:
+            lines.append(f"{name}{_labels(('cache',), (cache,))} {stats[field]}")
+    return lines
+
+
+def _pool_gauges() -> List[str]:
+    """Checked-out and idle connections per database pool"""
+    from backend.app.core.database import pool_status
+
+    samples = {}
+    for pool, status in pool_status().items():
+        for state in ("checked_out", "idle"):
+            samples[(("pool", "state"), (pool, state))] = status[state]
+    return _gauge("db_pool_connections", "Pooled database connections by state", samples)
+
+
+def _rate_limit_counters() -> List[str]:
+    from backend.app.core.rate_limit import rate_limit_stats
+
+    stats = rate_limit_stats()
+    lines = [
+        "# HELP outbound_rate_limit_calls_total Outbound calls by limiter decision",
+        "# TYPE outbound_rate_limit_calls_total counter",
+    ]
+    for decision in ("granted", "throttled"):
+        for key, count in stats[decision].items():
+            platform, priority = key.split(":", 1)
+            labels = _labels(("platform", "priority", "decision"), (platform, priority, decision))
+            lines.append(f"outbound_rate_limit_calls_total{labels} {count}")
+    return lines
+
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text exposition format (version 0.0.4)"""
+    lines: List[str] = []
+    for metric in (
+        HTTP_REQUEST_DURATION, HTTP_REQUESTS,
+        UPSTREAM_REQUEST_DURATION, UPSTREAM_REQUESTS,
+        DB_QUERY_DURATION, DB_POOL_WAIT, DB_CONNECTION_HOLD,
+        CACHE_LOOKUPS, SINGLEFLIGHT_CALLS,
+    ):
+        lines.extend(metric.render())
+    lines.extend(_rate_limit_counters())
+    lines.extend(_cache_metrics())
+    lines.extend(_pool_gauges())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,125 @@
+"""
+Upstream Pagination
+
+This module follows the platforms' pagination cursors lazily, one page at a
+time, so callers can stream an account's full history with bounded memory.
+
+Functions:
+- paginate: Async generator yielding items across pages
+- instagram_next_page: Cursor strategy for Graph API `paging.next` URLs
+- twitter_next_page: Cursor strategy for Twitter v2 `meta.next_token`
+- ndjson_stream: Encode an async item stream as newline-delimited JSON
+"""
+
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+from backend.app.core.rate_limit import RateLimited
+
+# next_page(response_json, url, params) -> (url, params) for the next page, or None.
+# params is None when the URL already carries its full query string.
+NextPage = Callable[[dict, str, dict], Optional[Tuple[str, dict]]]
+
+
+def instagram_next_page(data: dict, url: str, params: dict):
+    """Graph API returns the full URL (cursor included) of the next page"""
+    next_url = data.get("paging", {}).get("next")
+    # No params: passing any would replace the cursor in the URL's query string
+    return (next_url, None) if next_url else None
+
+
+def twitter_next_page(data: dict, url: str, params: dict):
+    """Twitter v2 returns a token to pass back as pagination_token"""
+    next_token = data.get("meta", {}).get("next_token")
+    return (url, {**(params or {}), "pagination_token": next_token}) if next_token else None
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    Parse a platform timestamp into an aware UTC datetime
+
+    Handles Instagram's `2024-01-31T12:00:00+0000` and Twitter's
+    `2024-01-31T12:00:00.000Z` formats.
+    """
+    value = value.replace("Z", "+00:00")
+    if len(value) > 5 and value[-5] in "+-" and value[-3] != ":":
+        value = f"{value[:-2]}:{value[-2:]}"
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def paginate(
+    client: httpx.AsyncClient,
+    url: str,
+    next_page: NextPage,
+    platform: str,
+    params: Optional[dict] = None,
+    headers: Optional[dict] = None,
+    max_items: Optional[int] = None,
+    since: Optional[datetime] = None,
+    timestamp_field: Optional[str] = None,
+) -> AsyncIterator[dict]:
+    """
+    Yield items from every page of an upstream listing, newest first
+
+    Pages are only requested as the caller consumes items, so at most one
+    page is held in memory at a time.
+
+    Args:
+        client: Shared upstream client for the platform
+        url: URL of the first page
+        next_page: Cursor strategy (instagram_next_page or twitter_next_page)
+        platform: Platform name, used in error messages
+        params: Query parameters for the first page
+        headers: Request headers (e.g. Authorization)
+        max_items: Stop after yielding this many items
+        since: Stop at the first item older than this time
+        timestamp_field: Item field holding its creation time (required with since)
+
+    Example:
+        async for post in paginate(client, url, instagram_next_page, "instagram", max_items=500):
+            ...
+    """
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+
+    yielded = 0
+
+    while True:
+        res = await client.get(url, params=params, headers=headers)
+        if res.is_error:
+            raise HTTPException(status_code=502, detail=f"{platform} API request failed ({res.status_code})")
+        data = res.json()
+
+        for item in data.get("data", []):
+            if since is not None and item.get(timestamp_field):
+                if parse_timestamp(item[timestamp_field]) < since:
+                    return
+            yield item
+            yielded += 1
+            if max_items is not None and yielded >= max_items:
+                return
+
+        following = next_page(data, url, params)
+        if following is None:
+            return
+        url, params = following
+
+
+async def ndjson_stream(items: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """
+    Encode items as newline-delimited JSON for a StreamingResponse
+
+    An upstream failure after the response has started cannot change the HTTP
+    status, so it is reported as a final `{"error": ...}` line instead.
+    """
+    try:
+        async for item in items:
+            yield json.dumps(item) + "\n"
+    except HTTPException as e:
+        yield json.dumps({"error": e.detail}) + "\n"
+    except RateLimited as e:
+        yield json.dumps({"error": str(e)}) + "\n"
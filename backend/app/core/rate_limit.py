@@ -0,0 +1,204 @@
+"""
+Outbound Rate Limiting
+
+A distributed token-bucket limiter for calls to the platform APIs, stored in
+Redis so every worker process (and the ETL) shares the same quota view.
+
+Each upstream call takes one token from two buckets: the platform-wide (app)
+bucket and the bucket of the access token being used. Calls have a priority:
+interactive requests may drain a bucket completely, while ETL calls stop at a
+reserve (RATE_LIMIT_ETL_RESERVE) so dashboards keep working during ETL runs.
+When an upstream answers 429, its Retry-After is recorded and further calls
+with that token wait it out instead of retrying into the limit.
+
+The bucket sizes, Redis key layout and Lua script live in
+backend/shared/rate_limits.py, which the ETL's synchronous client
+(etl/helpers/rate_limit.py) imports too.
+
+Functions:
+- acquire: Wait for quota for one upstream call (raises RateLimited on timeout)
+- record_response: Apply Retry-After backoff and track upstream quota headers
+- request_hook / response_hook: httpx event hooks wiring the limiter into a client
+- quota_status: Remaining tokens for a platform (and optionally an access token)
+- rate_limit_stats: In-process counters of granted and throttled calls
+
+Configuration (environment variables):
+- RATE_LIMIT_<PLATFORM>_APP / RATE_LIMIT_<PLATFORM>_TOKEN: "<calls>/<seconds>"
+- RATE_LIMIT_ETL_RESERVE: Fraction of each bucket ETL calls may not use
+- RATE_LIMIT_MAX_WAIT: Seconds an interactive call waits for quota before failing
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Optional
+
+import httpx
+import redis
+from backend.app.core.redis import LuaScript, get_async_redis
+from backend.shared.rate_limits import TOKEN_BUCKET_LUA, keys_and_args, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+ETL = "etl"
+
+# In-process counters: (platform, priority) -> count
+_granted = defaultdict(int)
+_throttled = defaultdict(int)
+
+# Latest quota headers seen from each platform
+_upstream_quota = {}
+
+_token_bucket = LuaScript(TOKEN_BUCKET_LUA)
+
+
+class RateLimited(Exception):
+    """Raised when no quota became available within the allowed wait"""
+
+    def __init__(self, platform: str, retry_after: float):
+        super().__init__(f"{platform} rate limit reached, retry in {retry_after:.0f}s")
+        self.platform = platform
+        self.retry_after = retry_after
+
+
+async def _try_acquire(platform: str, access_token: Optional[str], reserve: float) -> float:
+    """Run the token-bucket script once; returns 0 if granted, else seconds to wait"""
+    keys, args = keys_and_args(platform, access_token)
+    granted, wait = await _token_bucket(keys=keys, args=[1, reserve] + args)
+    return 0.0 if int(granted) else float(wait)
+
+
+async def acquire(platform: str, access_token: Optional[str] = None, priority: str = INTERACTIVE):
+    """
+    Wait until one call to the platform is allowed
+
+    Interactive calls wait at most RATE_LIMIT_MAX_WAIT seconds. If Redis is
+    unavailable the call is allowed so the limiter never takes the API down.
+
+    Args:
+        platform: Platform name (instagram, twitter, youtube)
+        access_token: Token the call is made with (None for app-level calls)
+        priority: INTERACTIVE or ETL
+
+    Raises:
+        RateLimited: If quota does not free up within the allowed wait
+    """
+    reserve = float(os.getenv("RATE_LIMIT_ETL_RESERVE", 0.2)) if priority == ETL else 0.0
+    deadline = time.monotonic() + float(os.getenv("RATE_LIMIT_MAX_WAIT", 2))
+
+    while True:
+        try:
+            wait = await _try_acquire(platform, access_token, reserve)
+        except redis.RedisError as e:
+            logger.warning("Rate limiter unavailable, allowing %s call: %s", platform, e)
+            return
+        if wait == 0:
+            _granted[(platform, priority)] += 1
+            return
+        if time.monotonic() + wait > deadline:
+            _throttled[(platform, priority)] += 1
+            raise RateLimited(platform, wait)
+        await asyncio.sleep(wait)
+
+
+async def _set_backoff(platform: str, access_token: Optional[str], seconds: float):
+    keys, _ = keys_and_args(platform, access_token)
+    await get_async_redis().set(keys[0], 1, px=int(seconds * 1000))
+
+
+async def record_response(platform: str, access_token: Optional[str], response: httpx.Response):
+    """
+    Learn from an upstream response
+
+    Remembers the platform's own quota headers for quota_status, and on a 429
+    blocks further calls with this token until the Retry-After has passed.
+    """
+    headers = response.headers
+    quota = {
+        name: headers[name]
+        for name in ("x-rate-limit-remaining", "x-rate-limit-limit", "x-app-usage", "x-business-use-case-usage")
+        if name in headers
+    }
+    if quota:
+        _upstream_quota[platform] = quota
+
+    if response.status_code == 429:
+        seconds = retry_after_seconds(response.headers)
+        logger.warning("%s returned 429, backing off for %.0fs", platform, seconds)
+        try:
+            await _set_backoff(platform, access_token, seconds)
+        except redis.RedisError as e:
+            logger.warning("Could not record %s backoff: %s", platform, e)
+
+
+def _request_token(request: httpx.Request) -> Optional[str]:
+    """Access token used by an outgoing request (bearer header or query param)"""
+    authorization = request.headers.get("authorization", "")
+    if authorization.startswith("Bearer "):
+        return authorization[len("Bearer "):]
+    return request.url.params.get("access_token")
+
+
+def request_hook(platform: str):
+    """httpx request hook acquiring quota before every call on a platform client"""
+    async def hook(request: httpx.Request):
+        await acquire(platform, _request_token(request), INTERACTIVE)
+    return hook
+
+
+def response_hook(platform: str):
+    """httpx response hook recording backoff and quota headers"""
+    async def hook(response: httpx.Response):
+        await record_response(platform, _request_token(response.request), response)
+    return hook
+
+
+async def quota_status(platform: str, access_token: Optional[str] = None) -> dict:
+    """
+    Remaining tokens in a platform's buckets (read in one pipelined round-trip)
+
+    Args:
+        platform: Platform name (instagram, twitter, youtube)
+        access_token: Also report this token's bucket
+
+    Returns:
+        Dict with remaining tokens per bucket and the last upstream quota headers;
+        buckets and backoff_seconds are None if Redis is unavailable
+    """
+    keys, args = keys_and_args(platform, access_token)
+    try:
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            for key in keys[1:]:
+                pipe.hmget(key, "tokens", "ts")
+            pipe.pttl(keys[0])
+            *levels, backoff_ms = await pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Could not read %s quota: %s", platform, e)
+        return {"buckets": None, "backoff_seconds": None, "upstream": _upstream_quota.get(platform, {})}
+
+    now = time.time()
+    buckets = {}
+    for index, (tokens, ts) in enumerate(levels):
+        capacity, rate = args[index * 2], args[index * 2 + 1]
+        if tokens is None:
+            remaining = capacity
+        else:
+            remaining = min(capacity, float(tokens) + max(0.0, now - float(ts)) * rate)
+        buckets["app" if index == 0 else "token"] = {"remaining": int(remaining), "capacity": capacity}
+
+    return {
+        "buckets": buckets,
+        "backoff_seconds": max(0, backoff_ms) / 1000,
+        "upstream": _upstream_quota.get(platform, {}),
+    }
+
+
+def rate_limit_stats() -> dict:
+    """In-process counters of granted and throttled calls per platform and priority"""
+    return {
+        "granted": {f"{platform}:{priority}": count for (platform, priority), count in _granted.items()},
+        "throttled": {f"{platform}:{priority}": count for (platform, priority), count in _throttled.items()},
+    }
@@ -1,10 +1,165 @@
+"""
+Redis Clients
+
+Every Redis user in the app shares one connection pool per process instead of
+opening a new connection per call. Async code (routes, httpx hooks, background
+refreshes) uses a redis.asyncio client opened and closed with the FastAPI
+lifespan; the sync client remains for synchronous callers.
+
+Both clients use short socket timeouts and a single retry: Redis backs caches
+and limiters that fail open, so an unreachable Redis must cost milliseconds,
+not seconds, per request.
+
+Functions:
+- get_redis_client: Sync client on the shared connection pool
+- init_async_redis / close_async_redis: Open and close the asyncio client (lifespan)
+- get_async_redis: The shared asyncio client
+- mget / mset: Multi-key get and set in one round-trip (pipelined for per-key TTLs)
+- LuaScript: Atomic server-side script, run with EVALSHA
+
+Configuration (environment variables):
+- REDIS_HOST / REDIS_PORT / REDIS_DB: Server location
+- REDIS_MAX_CONNECTIONS: Connections per pool
+- REDIS_SOCKET_TIMEOUT: Seconds to wait for a reply
+- REDIS_CONNECT_TIMEOUT: Seconds to wait for a connection
+- REDIS_RETRIES: Retries of a command after a connection error
+"""
+
+import hashlib
 import os
+import threading
+from typing import Mapping, Optional, Sequence
+
 import redis
+import redis.asyncio
+from redis.asyncio.retry import Retry as AsyncRetry
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+
+_sync_client: Optional[redis.Redis] = None
+_sync_lock = threading.Lock()
+_async_client: Optional[redis.asyncio.Redis] = None
+
 
-def get_redis_client():
-    return redis.Redis(
-        host=os.getenv("REDIS_HOST", "localhost"),
-        port=int(os.getenv("REDIS_PORT", 6379)),
-        db=int(os.getenv("REDIS_DB", 0)),
-        decode_responses=True
+def _connection_options() -> dict:
+    return {
+        "host": os.getenv("REDIS_HOST", "localhost"),
+        "port": int(os.getenv("REDIS_PORT", 6379)),
+        "db": int(os.getenv("REDIS_DB", 0)),
+        "max_connections": int(os.getenv("REDIS_MAX_CONNECTIONS", 50)),
+        "socket_timeout": float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.5)),
+        "socket_connect_timeout": float(os.getenv("REDIS_CONNECT_TIMEOUT", 0.5)),
+        "decode_responses": True,
+    }
+
+
+def get_redis_client() -> redis.Redis:
+    """Sync client on the process-wide connection pool"""
+    global _sync_client
+    if _sync_client is None:
+        with _sync_lock:
+            if _sync_client is None:
+                pool = redis.ConnectionPool(
+                    retry=Retry(NoBackoff(), int(os.getenv("REDIS_RETRIES", 1))),
+                    **_connection_options(),
+                )
+                _sync_client = redis.Redis(connection_pool=pool)
+    return _sync_client
+
+
+def init_async_redis() -> redis.asyncio.Redis:
+    """
+    Create the shared asyncio client (called on application startup)
+
+    Connections are opened lazily, so startup does not fail when Redis is down.
+    """
+    global _async_client
+    pool = redis.asyncio.ConnectionPool(
+        retry=AsyncRetry(NoBackoff(), int(os.getenv("REDIS_RETRIES", 1))),
+        **_connection_options(),
     )
+    _async_client = redis.asyncio.Redis(connection_pool=pool)
+    return _async_client
+
+
+async def close_async_redis():
+    """Close the asyncio client and its pool (called on application shutdown)"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    """
+    The shared asyncio client
+
+    Created on first use when the lifespan has not run (scripts, benchmarks).
+    """
+    if _async_client is None:
+        return init_async_redis()
+    return _async_client
+
+
+async def mget(keys: Sequence[str]) -> list:
+    """
+    Get several keys in one round-trip
+
+    Args:
+        keys: Keys to read
+
+    Returns:
+        List of values in key order, None for missing keys
+    """
+    if not keys:
+        return []
+    return await get_async_redis().mget(list(keys))
+
+
+async def mset(values: Mapping[str, str], ttl_ms: Optional[int] = None, ttls_ms: Optional[Mapping[str, int]] = None):
+    """
+    Set several keys in one round-trip
+
+    Without TTLs this is a single MSET; with TTLs the SETs are pipelined.
+
+    Args:
+        values: Key -> value to store
+        ttl_ms: Expiry in milliseconds applied to every key
+        ttls_ms: Per-key expiry in milliseconds (overrides ttl_ms)
+    """
+    if not values:
+        return
+    client = get_async_redis()
+    if ttl_ms is None and not ttls_ms:
+        await client.mset(dict(values))
+        return
+    async with client.pipeline(transaction=False) as pipe:
+        for key, value in values.items():
+            expiry = (ttls_ms or {}).get(key, ttl_ms)
+            pipe.set(key, value, px=expiry)
+        await pipe.execute()
+
+
+class LuaScript:
+    """
+    Lua script executed atomically on the Redis server
+
+    Runs with EVALSHA so only the script's hash is sent per call; the source
+    is sent again only when the server does not have it cached yet.
+
+    Example:
+        COMPARE_AND_DELETE = LuaScript("if redis.call('GET', KEYS[1]) == ARGV[1] then ...")
+        await COMPARE_AND_DELETE(keys=[lock_key], args=[owner])
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.sha = hashlib.sha1(source.encode()).hexdigest()
+
+    async def __call__(self, keys: Sequence = (), args: Sequence = (), client: Optional[redis.asyncio.Redis] = None):
+        client = client or get_async_redis()
+        try:
+            return await client.evalsha(self.sha, len(keys), *keys, *args)
+        except redis.exceptions.NoScriptError:
+            # EVAL also caches the script for the next EVALSHA
+            return await client.eval(self.source, len(keys), *keys, *args)
@@ -0,0 +1,182 @@
+"""
+Single-Flight Request Coalescing
+
+When many requests need the same upstream data at once (several dashboard
+tabs, or a cache entry expiring under load), only one upstream call is made
+and every caller receives its result.
+
+Within a process, concurrent callers await one shared task. Across worker
+processes, a Redis lock elects one leader; the others wait for the leader's
+result in Redis instead of calling upstream themselves.
+
+Functions:
+- single_flight: Run a fetch once for all concurrent callers with the same key
+- coalesced: Decorator applying single_flight to a fetch helper
+
+Every call is counted in singleflight_calls_total (core/metrics.py) by role:
+leader (called upstream), shared (joined a fetch in this process), follower
+(used another process's result) or fallback (fetched after the leader failed).
+
+Configuration (environment variables):
+- SINGLEFLIGHT_LOCK_SECONDS: Longest a leader may hold the cross-process lock
+- SINGLEFLIGHT_RESULT_SECONDS: How long a leader's result stays readable
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict
+
+import redis
+from backend.app.core.metrics import SINGLEFLIGHT_CALLS
+from backend.app.core.redis import LuaScript, mget
+
+logger = logging.getLogger(__name__)
+
+# How often a follower in another process checks for the leader's result
+POLL_INTERVAL_SECONDS = 0.05
+
+# key -> task currently fetching it in this process
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def _record(key: str, role: str):
+    # Keys start with "<platform>:<endpoint>:"
+    platform, endpoint = (key.split(":") + ["", ""])[:2]
+    SINGLEFLIGHT_CALLS.inc((platform, endpoint, role))
+
+
+def _lock_seconds() -> float:
+    return float(os.getenv("SINGLEFLIGHT_LOCK_SECONDS", 10))
+
+
+def _result_seconds() -> float:
+    return float(os.getenv("SINGLEFLIGHT_RESULT_SECONDS", 5))
+
+
+# Take the lock, or return the current owner's ID if someone holds it
+# KEYS[1] = lock key; ARGV[1] = owner ID, ARGV[2] = lock expiry (ms)
+LOCK_OR_OWNER_LUA = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+  return false
+end
+return redis.call('GET', KEYS[1])
+"""
+
+# Publish the leader's result (if any) and release its lock, in one round-trip
+# KEYS[1] = lock key, KEYS[2] = result key
+# ARGV[1] = owner ID, ARGV[2] = JSON result ('' if the fetch failed), ARGV[3] = result expiry (ms)
+FINISH_LUA = """
+if ARGV[2] ~= '' then
+  redis.call('SET', KEYS[2], ARGV[2], 'PX', ARGV[3])
+end
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  redis.call('DEL', KEYS[1])
+end
+return 1
+"""
+
+_lock_or_owner = LuaScript(LOCK_OR_OWNER_LUA)
+_finish = LuaScript(FINISH_LUA)
+
+
+async def _release(key: str, lock_key: str, owner: str, result: Any = None):
+    payload = json.dumps(result) if result is not None else ""
+    try:
+        await _finish(
+            keys=[lock_key, f"singleflight:{key}:result:{owner}"],
+            args=[owner, payload, int(_result_seconds() * 1000)],
+        )
+    except redis.RedisError as e:
+        logger.warning("Could not release single-flight lock %s: %s", key, e)
+
+
+async def _fetch_across_processes(key: str, fetch: Callable[[], Awaitable[Any]]):
+    owner = uuid.uuid4().hex
+    lock_key = f"singleflight:{key}:lock"
+
+    try:
+        leader = await _lock_or_owner(keys=[lock_key], args=[owner, int(_lock_seconds() * 1000)])
+    except redis.RedisError as e:
+        logger.warning("Single-flight lock unavailable for %s: %s", key, e)
+        _record(key, "leader")
+        return await fetch()
+
+    if leader is None:
+        # This process is the leader: fetch and share the result
+        _record(key, "leader")
+        try:
+            result = await fetch()
+        except BaseException:
+            await _release(key, lock_key, owner)
+            raise
+        await _release(key, lock_key, owner, result)
+        return result
+
+    # Another process is fetching: wait for its result
+    result_key = f"singleflight:{key}:result:{leader}"
+    deadline = time.monotonic() + _lock_seconds()
+    while time.monotonic() < deadline:
+        try:
+            raw_result, current_leader = await mget([result_key, lock_key])
+        except redis.RedisError:
+            break
+        if raw_result is not None:
+            _record(key, "follower")
+            return json.loads(raw_result)
+        if current_leader != leader:
+            break  # The leader failed or its lock expired
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    _record(key, "fallback")
+    return await fetch()
+
+
+async def single_flight(key: str, fetch: Callable[[], Awaitable[Any]]):
+    """
+    Run fetch once for every concurrent caller using the same key
+
+    The fetch runs in its own task, so a caller disconnecting does not cancel
+    it for the others. Results must be JSON-serialisable to be shared across
+    processes.
+
+    Args:
+        key: Identity of the upstream call, e.g. "youtube:analytics:<channel_id>"
+        fetch: Coroutine function performing the upstream call
+
+    Returns:
+        The fetch result (shared by all concurrent callers)
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_across_processes(key, fetch))
+        _inflight[key] = task
+        task.add_done_callback(lambda done: _inflight.pop(key) if _inflight.get(key) is done else None)
+    else:
+        _record(key, "shared")
+    return await asyncio.shield(task)
+
+
+def coalesced(platform: str, endpoint: str):
+    """
+    Decorator coalescing a fetch helper per (platform, endpoint, account)
+
+    The decorated coroutine must take (client, account, ...) where account has
+    an account_id attribute.
+
+    Example:
+        @coalesced("youtube", "analytics")
+        async def fetch_youtube_analytics(client, account):
+            ...
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(client, account, *args):
+            key = f"{platform}:{endpoint}:{account.account_id}"
+            return await single_flight(key, lambda: fn(client, account, *args))
+        return wrapper
+    return decorator
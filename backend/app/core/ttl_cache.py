@@ -0,0 +1,90 @@
+"""
+In-Process TTL Cache
+
+A small, thread-safe LRU cache whose entries expire after a time-to-live.
+Used for hot lookups that would otherwise hit the database on every request.
+
+Classes:
+- TTLCache: Bounded LRU mapping with per-entry expiry and hit/miss counters
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# Returned by get() on a miss so that None can be cached as a real value
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with time-based expiry
+
+    When the cache is full the least recently used entry is evicted. Each entry
+    expires after the cache's default TTL, or at an explicit time given to set().
+
+    Example:
+        cache = TTLCache(maxsize=1000, ttl=60)
+        cache.set(("user", 1), value)
+        value = cache.get(("user", 1))  # MISSING if absent or expired
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value, or MISSING if absent or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        """
+        Store a value
+
+        Args:
+            key: Cache key
+            value: Value to store
+            expires_at: Optional time.monotonic() deadline overriding the default TTL
+        """
+        if expires_at is None:
+            expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Remove one entry if present"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """Current size and hit/miss counters"""
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
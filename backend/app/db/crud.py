@@ -7,40 +7,84 @@ These functions are used by the API routes to interact with the database.
 Functions are organized by model:
 - User operations
 - Social Account operations
+- Analytics operations (tables built by the ETL)
+- Async operations (for `async def` routes, using an AsyncSession)
+
+Read-only lookups run on the read replica (core/database.py READ_REPLICA) when
+one is configured. Pass use_replica=False where the read must see the latest
+writes, e.g. just before an update. Account tokens are always read from the
+primary: they are cached in-process, and a token read from a lagging replica
+would otherwise stay cached for the whole TTL.
 """
 
+import os
+from typing import NamedTuple
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError, OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from backend.app.core.cache import invalidate_social_cache, invalidate_social_cache_async
+from backend.app.core.database import READ_REPLICA
+from backend.app.core.ttl_cache import MISSING, TTLCache
 from backend.app.db import models
 
 
+class SocialAccountCredentials(NamedTuple):
+    """Detached copy of the SocialAccount fields the /social routes need"""
+    access_token: str
+    account_id: str
+
+
+# In-process cache of credentials keyed by (user_id, platform). Entries are
+# dropped by create_or_update_social_account*; the TTL bounds staleness when
+# another worker process updates a token.
+social_account_cache = TTLCache(
+    maxsize=int(os.getenv("ACCOUNT_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("ACCOUNT_CACHE_TTL", 60)),
+)
+
+
+def _reads(use_replica: bool):
+    """bind_arguments sending a read to the replica, or None for the primary"""
+    return READ_REPLICA if use_replica else None
+
+
 # ==================== User Operations ====================
 
-def get_user(db: Session, user_id: int):
+def get_user(db: Session, user_id: int, use_replica: bool = True):
     """
     Get a user by ID
     
     Args:
         db: Database session
         user_id: User's ID
+        use_replica: Read from the read replica if one is configured
         
     Returns:
         User object or None if not found
     """
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return db.execute(
+        select(models.User).where(models.User.id == user_id),
+        bind_arguments=_reads(use_replica)
+    ).scalars().first()
 
 
-def get_user_by_email(db: Session, email: str):
+def get_user_by_email(db: Session, email: str, use_replica: bool = True):
     """
     Get a user by email address
     
     Args:
         db: Database session
         email: User's email
+        use_replica: Read from the read replica if one is configured
         
     Returns:
         User object or None if not found
     """
-    return db.query(models.User).filter(models.User.email == email).first()
+    return db.execute(
+        select(models.User).where(models.User.email == email),
+        bind_arguments=_reads(use_replica)
+    ).scalars().first()
 
 
 def create_user(db: Session, username: str, email: str, hashed_password: str):
@@ -65,7 +109,7 @@ def create_user(db: Session, username: str, email: str, hashed_password: str):
 
 # ==================== Social Account Operations ====================
 
-def get_social_account(db: Session, user_id: int, platform: str):
+def get_social_account(db: Session, user_id: int, platform: str, use_replica: bool = True):
     """
     Get a user's social account for a specific platform
     
@@ -73,14 +117,18 @@ def get_social_account(db: Session, user_id: int, platform: str):
         db: Database session
         user_id: User's ID
         platform: Platform name (instagram, twitter, youtube)
+        use_replica: Read from the read replica if one is configured
         
     Returns:
         SocialAccount object or None if not found
     """
-    return db.query(models.SocialAccount).filter(
-        models.SocialAccount.user_id == user_id,
-        models.SocialAccount.platform == platform
-    ).first()
+    return db.execute(
+        select(models.SocialAccount).where(
+            models.SocialAccount.user_id == user_id,
+            models.SocialAccount.platform == platform
+        ),
+        bind_arguments=_reads(use_replica)
+    ).scalars().first()
 
 
 def create_or_update_social_account(
@@ -95,7 +143,8 @@ def create_or_update_social_account(
     
     This function handles both initial OAuth connection and token refresh.
     If an account already exists for this user+platform, it updates the token.
-    Otherwise, it creates a new account record.
+    Otherwise, it creates a new account record. Cached /social responses for
+    the user's platform are invalidated whenever the token changes.
     
     Args:
         db: Database session
@@ -107,8 +156,10 @@ def create_or_update_social_account(
     Returns:
         Created or updated SocialAccount object
     """
-    # Check if account already exists
-    account = get_social_account(db, user_id, platform)
+    # Check if account already exists (on the primary: it is about to be written)
+    account = get_social_account(db, user_id, platform, use_replica=False)
+    
+    token_changed = account is None or account.access_token != access_token
     
     if account:
         # Update existing account
@@ -126,4 +177,277 @@ def create_or_update_social_account(
     
     db.commit()
     db.refresh(account)
-    return account
\ No newline at end of file
+    
+    social_account_cache.invalidate((user_id, platform))
+    if token_changed:
+        # Responses cached under the old token are no longer valid
+        invalidate_social_cache(user_id, platform)
+    
+    return account
+
+
+# ==================== Async Operations ====================
+# Same operations as above for `async def` routes. They take an AsyncSession so
+# database round-trips are awaited instead of blocking the event loop.
+
+async def get_user_async(db: AsyncSession, user_id: int, use_replica: bool = True):
+    """
+    Get a user by ID
+    
+    Args:
+        db: Async database session
+        user_id: User's ID
+        use_replica: Read from the read replica if one is configured
+        
+    Returns:
+        User object or None if not found
+    """
+    result = await db.execute(
+        select(models.User).where(models.User.id == user_id),
+        bind_arguments=_reads(use_replica)
+    )
+    return result.scalars().first()
+
+
+async def get_user_by_email_async(db: AsyncSession, email: str, use_replica: bool = True):
+    """
+    Get a user by email address
+    
+    Args:
+        db: Async database session
+        email: User's email
+        use_replica: Read from the read replica if one is configured
+        
+    Returns:
+        User object or None if not found
+    """
+    result = await db.execute(
+        select(models.User).where(models.User.email == email),
+        bind_arguments=_reads(use_replica)
+    )
+    return result.scalars().first()
+
+
+async def create_user_async(db: AsyncSession, username: str, email: str, hashed_password: str):
+    """
+    Create a new user
+    
+    Args:
+        db: Async database session
+        username: Desired username
+        email: User's email
+        hashed_password: Bcrypt hashed password
+        
+    Returns:
+        Created User object
+    """
+    user = models.User(username=username, email=email, hashed_password=hashed_password)
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+
+async def update_user_password_async(db: AsyncSession, user: models.User, hashed_password: str):
+    """
+    Replace a user's password hash (e.g. after a bcrypt cost change)
+    
+    Args:
+        db: Async database session
+        user: User object to update (may be detached, e.g. after release_db_connection)
+        hashed_password: New bcrypt hash
+        
+    Returns:
+        Updated User object
+    """
+    user.hashed_password = hashed_password
+    db.add(user)
+    await db.commit()
+    return user
+
+
+async def get_social_account_async(db: AsyncSession, user_id: int, platform: str, use_replica: bool = True):
+    """
+    Get a user's social account for a specific platform
+    
+    Args:
+        db: Async database session
+        user_id: User's ID
+        platform: Platform name (instagram, twitter, youtube)
+        use_replica: Read from the read replica if one is configured
+        
+    Returns:
+        SocialAccount object or None if not found
+    """
+    result = await db.execute(
+        select(models.SocialAccount).where(
+            models.SocialAccount.user_id == user_id,
+            models.SocialAccount.platform == platform
+        ),
+        bind_arguments=_reads(use_replica)
+    )
+    return result.scalars().first()
+
+
+async def get_social_account_credentials_async(db: AsyncSession, user_id: int, platform: str):
+    """
+    Get the token and account ID of a user's social account, cached in-process
+    
+    Hot read path for the /social routes: while an entry is cached no database
+    query is made, otherwise the primary is queried. Not the replica: a token
+    read from a lagging replica just after an update would stay cached (and
+    fail upstream) for the whole TTL. Use get_social_account_cache_stats()
+    for hit/miss counters.
+    
+    Args:
+        db: Async database session
+        user_id: User's ID
+        platform: Platform name (instagram, twitter, youtube)
+        
+    Returns:
+        SocialAccountCredentials or None if the account is not connected
+    """
+    key = (user_id, platform)
+    credentials = social_account_cache.get(key)
+    if credentials is not MISSING:
+        return credentials
+    
+    account = await get_social_account_async(db, user_id, platform, use_replica=False)
+    if account is None:
+        return None
+    
+    credentials = SocialAccountCredentials(account.access_token, account.account_id)
+    social_account_cache.set(key, credentials)
+    return credentials
+
+
+def get_social_account_cache_stats():
+    """
+    Size and hit/miss counters of the in-process social account cache
+    
+    Returns:
+        Dict with size, maxsize, hits and misses
+    """
+    return social_account_cache.stats()
+
+
+async def get_social_accounts_async(db: AsyncSession, user_id: int, use_replica: bool = False):
+    """
+    Get all of a user's social accounts in a single query
+    
+    Reads from the primary by default, since callers use the tokens; only then
+    is the credentials cache warmed (see get_social_account_credentials_async).
+    
+    Args:
+        db: Async database session
+        user_id: User's ID
+        use_replica: Read from the read replica if one is configured (for
+            listings that do not use the tokens)
+        
+    Returns:
+        List of SocialAccount objects (empty if none are connected)
+    """
+    result = await db.execute(
+        select(models.SocialAccount).where(models.SocialAccount.user_id == user_id),
+        bind_arguments=_reads(use_replica)
+    )
+    accounts = list(result.scalars().all())
+    if use_replica:
+        return accounts
+    
+    # Warm the credentials cache for the per-platform routes
+    for account in accounts:
+        social_account_cache.set(
+            (user_id, account.platform),
+            SocialAccountCredentials(account.access_token, account.account_id)
+        )
+    
+    return accounts
+
+
+async def create_or_update_social_account_async(
+    db: AsyncSession, 
+    user_id: int, 
+    platform: str, 
+    account_id: str, 
+    access_token: str
+):
+    """
+    Create a new social account or update existing one
+    
+    Async counterpart of create_or_update_social_account, with the same
+    cache invalidation when the token changes.
+    
+    Args:
+        db: Async database session
+        user_id: User's ID
+        platform: Platform name (instagram, twitter, youtube)
+        account_id: Platform's user ID
+        access_token: OAuth access token
+        
+    Returns:
+        Created or updated SocialAccount object
+    """
+    account = await get_social_account_async(db, user_id, platform, use_replica=False)
+    
+    token_changed = account is None or account.access_token != access_token
+    
+    if account:
+        account.access_token = access_token
+        account.account_id = account_id
+    else:
+        account = models.SocialAccount(
+            user_id=user_id,
+            platform=platform,
+            account_id=account_id,
+            access_token=access_token
+        )
+        db.add(account)
+    
+    await db.commit()
+    await db.refresh(account)
+    
+    social_account_cache.invalidate((user_id, platform))
+    if token_changed:
+        await invalidate_social_cache_async(user_id, platform)
+    
+    return account
+
+
+# ==================== Analytics Operations ====================
+
+def _is_undefined_table(error: DBAPIError) -> bool:
+    """Whether a failed query referenced a table that does not exist"""
+    # Postgres reports SQLSTATE 42P01 (psycopg2 and asyncpg); SQLite has no code
+    return getattr(error.orig, "pgcode", None) == "42P01" or "no such table" in str(error.orig)
+
+
+async def get_best_time_heatmap_async(db: AsyncSession, platform: str, account_id: str):
+    """
+    Get an account's best-posting-time heatmap (on the read replica)
+    
+    Args:
+        db: Async database session
+        platform: Platform name (instagram, youtube)
+        account_id: Platform's user ID of the account
+        
+    Returns:
+        List of heatmap rows ordered by weekday and hour (empty until the ETL
+        has processed the account's posts), or None if the best_time_heatmap
+        table does not exist yet (before the first dbt run)
+    """
+    heatmap = models.best_time_heatmap
+    try:
+        result = await db.execute(
+            select(heatmap).where(
+                heatmap.c.platform == platform,
+                heatmap.c.account_id == account_id
+            ).order_by(heatmap.c.weekday, heatmap.c.hour),
+            bind_arguments=READ_REPLICA
+        )
+    except (ProgrammingError, OperationalError) as e:
+        if _is_undefined_table(e):
+            await db.rollback()
+            return None
+        raise
+    return list(result.all())
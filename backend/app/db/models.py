@@ -9,9 +9,12 @@ Models:
 - SocialAccount: Connected social media accounts (Instagram, Twitter, YouTube)
 - PostAnalytics: Analytics data for social media posts
 - Trend: Trending hashtags and songs across platforms
+
+Tables built by the ETL's dbt project (read-only here, not managed by Alembic):
+- best_time_heatmap: Smoothed engagement per account, weekday and hour
 """
 
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Float, Text, UniqueConstraint
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Float, Text, UniqueConstraint, MetaData, Table
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from backend.app.core.database import Base
@@ -123,4 +126,23 @@ class Trend(Base):
     hashtag = Column(String, unique=True, index=True, nullable=True)
     song_name = Column(String, unique=True, index=True, nullable=True)
     popularity_score = Column(Float, default=0.0)  # 0.0 to 100.0
-    detected_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    detected_at = Column(DateTime, default=datetime.utcnow)
+
+
+# dbt-owned tables live on their own MetaData so Alembic autogenerate ignores them
+dbt_metadata = MetaData()
+
+# One row per (platform, account_id, weekday, hour); weekday 0 = Sunday, hours in UTC.
+# Rebuilt incrementally by etl/dbt_project/models/marts/analytics/best_time_heatmap.sql
+best_time_heatmap = Table(
+    "best_time_heatmap",
+    dbt_metadata,
+    Column("platform", String, nullable=False),
+    Column("account_id", String, nullable=False),  # Platform's user ID
+    Column("weekday", Integer, nullable=False),
+    Column("hour", Integer, nullable=False),
+    Column("posts", Integer, nullable=False),  # Posts published in this slot
+    Column("score", Float, nullable=False),  # Smoothed average engagement
+    Column("is_reliable", Boolean, nullable=False),  # Enough nearby posts to trust the score
+    Column("loaded_at", DateTime(timezone=True)),
+)
@@ -1,14 +1,57 @@
-from fastapi import FastAPI
-from backend.app.routes import auth,social
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from backend.app.core.auth import init_hash_pool, shutdown_hash_pool
+from backend.app.core.database import dispose_engines
+from backend.app.core.http import create_http_clients, close_http_clients
+from backend.app.core.metrics import MetricsMiddleware, render_metrics
+from backend.app.core.rate_limit import RateLimited
+from backend.app.core.redis import close_async_redis, init_async_redis
+from backend.app.routes import analytics,auth,social
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pooled upstream clients shared by every request for the app's lifetime
+    app.state.http_clients = create_http_clients()
+    # Shared asyncio Redis client for caches, rate limits and single-flight
+    init_async_redis()
+    # bcrypt workers, spawned before any request is served
+    init_hash_pool()
+    try:
+        yield
+    finally:
+        await close_http_clients(app.state.http_clients)
+        await close_async_redis()
+        shutdown_hash_pool()
+        await dispose_engines()
+
+
+app = FastAPI(title="InfluenceAI Backend", version="0.1", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    # Outbound quota for the platform is exhausted; tell the client when to retry
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, int(exc.retry_after)))},
+    )
 
-app = FastAPI(title="InfluenceAI Backend", version="0.1")
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(social.router, prefix="/social", tags=["Social"])
+app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
 
 @app.get("/", tags=["Root"])
 def root():
     return {"message": "Welcome to InfluenceAI Backend"}
 
+@app.get("/metrics", tags=["Root"], response_class=PlainTextResponse)
+def metrics():
+    """Request, upstream, DB and cache metrics in the Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 
 # run with
-# uvicorn app.main:app --reload
\ No newline at end of file
+# uvicorn app.main:app --reload
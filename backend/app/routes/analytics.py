@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.core.auth import get_current_user_id
+from backend.app.core.cache import cached_response
+from backend.app.core.database import AsyncSessionLocal, get_async_db, release_db_connection
+from backend.app.db import crud
+
+router = APIRouter()
+
+# Slots returned as best_slots
+BEST_SLOTS = 3
+
+
+def next_occurrence(weekday: int, hour: int, now: datetime) -> datetime:
+    """Next UTC datetime after now falling on weekday (0 = Sunday) at hour"""
+    day = now.replace(minute=0, second=0, microsecond=0, hour=0)
+    days_ahead = (weekday - (now.weekday() + 1) % 7) % 7
+    slot = day + timedelta(days=days_ahead, hours=hour)
+    return slot if slot > now else slot + timedelta(days=7)
+
+
+def build_best_time(platform: str, rows) -> dict:
+    """Response body from an account's heatmap rows (see crud.get_best_time_heatmap_async)"""
+    cells = [
+        {
+            "weekday": row.weekday,
+            "hour": row.hour,
+            "score": round(row.score, 4),
+            "posts": row.posts,
+            "reliable": row.is_reliable,
+        }
+        for row in rows
+    ]
+    # Slots without enough nearby posts are shown in the heatmap but never recommended
+    best = sorted(
+        (c for c in cells if c["reliable"]),
+        key=lambda c: (c["score"], c["posts"]),
+        reverse=True,
+    )[:BEST_SLOTS]
+    next_best_time = None
+    if best:
+        now = datetime.now(timezone.utc)
+        next_best_time = next_occurrence(best[0]["weekday"], best[0]["hour"], now).isoformat()
+    return {
+        "platform": platform,
+        "timezone": "UTC",
+        "best_slots": best,
+        "next_best_time": next_best_time,
+        "heatmap": cells,
+    }
+
+
+# ==================== Best Posting Time ====================
+
+@router.get('/best-time')
+async def get_best_time(
+    platform: Literal["instagram", "youtube"],
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Best times to post for the user's account, from the nightly ETL's heatmap
+
+    weekday is 0 (Sunday) to 6 (Saturday) and hour is 0-23, both in UTC. Slots
+    with too few posts nearby have reliable=false and are not in best_slots.
+    The heatmap is empty until the ETL has processed the account's posts, and
+    the endpoint answers 404 until the ETL has built it for the first time.
+    """
+    account = await crud.get_social_account_credentials_async(db, user_id, platform)
+    await release_db_connection(db)
+    if not account:
+        raise HTTPException(status_code=404, detail=f"{platform} account not connected")
+
+    async def fetch():
+        # Own session: stale entries are refreshed after the request has finished
+        async with AsyncSessionLocal() as session:
+            rows = await crud.get_best_time_heatmap_async(session, platform, account.account_id)
+        if rows is None:
+            # Raised rather than returned so the answer is not cached
+            raise HTTPException(
+                status_code=404,
+                detail="Best-time heatmap not built yet; it is created by the nightly ETL",
+            )
+        return build_best_time(platform, rows)
+
+    return await cached_response(user_id, platform, "best_time", fetch)
@@ -1,5 +1,18 @@
-    finally:
-        db.close()
+import os
+import httpx
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.core.auth import (
+    PasswordHashingBusy,
+    create_access_token,
+    hash_password_async,
+    verify_and_update_password_async,
+)
+from backend.app.core.database import get_async_db, release_db_connection
+from backend.app.core.http import http_client
+from backend.app.db import crud
+
+router = APIRouter()
 
 # ==================== Instagram OAuth ====================
 
@@ -12,7 +25,11 @@ def instagram_auth():
     return {"auth_url": auth_url}
 
 @router.get('/instagram/callback')
-async def instagram_callback(code: str, db: Session = Depends(get_db)):
+async def instagram_callback(
+    code: str,
+    db: AsyncSession = Depends(get_async_db),
+    client: httpx.AsyncClient = Depends(http_client("instagram")),
+):
     """Handle Instagram OAuth callback"""
     app_id = os.getenv("INSTAGRAM_APP_ID")
     secret = os.getenv("INSTAGRAM_SECRET")
@@ -28,9 +45,8 @@ async def instagram_callback(code: str, db: Session = Depends(get_db)):
         "redirect_uri": redirect,
     }
     
-    async with httpx.AsyncClient() as client:
-        res = await client.post(token_url, data=data)
-        token_data = res.json()
+    res = await client.post(token_url, data=data)
+    token_data = res.json()
     
     if "access_token" not in token_data:
         raise HTTPException(status_code=400, detail="Failed to get access token")
@@ -42,8 +58,8 @@ async def instagram_callback(code: str, db: Session = Depends(get_db)):
     # In production, you'd create a user or link to existing user
     dummy_user_id = 1
     
-    # Store social account
-    crud.create_or_update_social_account(
+    # Store social account (the first DB use: no connection is held during the token exchange)
+    await crud.create_or_update_social_account_async(
         db=db,
         user_id=dummy_user_id,
         platform="instagram",
@@ -86,7 +102,12 @@ def twitter_auth():
     return {"auth_url": auth_url}
 
 @router.get('/twitter/callback')
-async def twitter_callback(code: str, state: str, db: Session = Depends(get_db)):
+async def twitter_callback(
+    code: str,
+    state: str,
+    db: AsyncSession = Depends(get_async_db),
+    client: httpx.AsyncClient = Depends(http_client("twitter")),
+):
     """Handle Twitter OAuth callback"""
     client_id = os.getenv("TWITTER_CLIENT_ID")
     client_secret = os.getenv("TWITTER_CLIENT_SECRET")
@@ -103,13 +124,12 @@ async def twitter_callback(code: str, state: str, db: Session = Depends(get_db))
         "code_verifier": "challenge"
     }
     
-    async with httpx.AsyncClient() as client:
-        res = await client.post(
-            token_url,
-            data=data,
-            auth=(client_id, client_secret)
-        )
-        token_data = res.json()
+    res = await client.post(
+        token_url,
+        data=data,
+        auth=(client_id, client_secret)
+    )
+    token_data = res.json()
     
     if "access_token" not in token_data:
         raise HTTPException(status_code=400, detail="Failed to get access token")
@@ -117,20 +137,19 @@ async def twitter_callback(code: str, state: str, db: Session = Depends(get_db))
     access_token = token_data["access_token"]
     
     # Get user info
-    async with httpx.AsyncClient() as client:
-        user_res = await client.get(
-            "https://api.twitter.com/2/users/me",
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
-        user_data = user_res.json()
+    user_res = await client.get(
+        "https://api.twitter.com/2/users/me",
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    user_data = user_res.json()
     
     twitter_user_id = user_data.get("data", {}).get("id")
     
     # TODO: Create or get user
     dummy_user_id = 1
     
-    # Store social account
-    crud.create_or_update_social_account(
+    # Store social account (the first DB use: no connection is held during the token exchange)
+    await crud.create_or_update_social_account_async(
         db=db,
         user_id=dummy_user_id,
         platform="twitter",
@@ -169,7 +188,11 @@ def youtube_auth():
     return {"auth_url": auth_url}
 
 @router.get('/youtube/callback')
-async def youtube_callback(code: str, db: Session = Depends(get_db)):
+async def youtube_callback(
+    code: str,
+    db: AsyncSession = Depends(get_async_db),
+    client: httpx.AsyncClient = Depends(http_client("youtube")),
+):
     """Handle YouTube OAuth callback"""
     client_id = os.getenv("GOOGLE_CLIENT_ID")
     client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
@@ -186,9 +209,8 @@ async def youtube_callback(code: str, db: Session = Depends(get_db)):
         "grant_type": "authorization_code"
     }
     
-    async with httpx.AsyncClient() as client:
-        res = await client.post(token_url, data=data)
-        token_data = res.json()
+    res = await client.post(token_url, data=data)
+    token_data = res.json()
     
     if "access_token" not in token_data:
         raise HTTPException(status_code=400, detail="Failed to get access token")
@@ -196,20 +218,19 @@ async def youtube_callback(code: str, db: Session = Depends(get_db)):
     access_token = token_data["access_token"]
     
     # Get YouTube channel info
-    async with httpx.AsyncClient() as client:
-        channel_res = await client.get(
-            "https://www.googleapis.com/youtube/v3/channels?part=id&mine=true",
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
-        channel_data = channel_res.json()
+    channel_res = await client.get(
+        "https://www.googleapis.com/youtube/v3/channels?part=id&mine=true",
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    channel_data = channel_res.json()
     
     channel_id = channel_data.get("items", [{}])[0].get("id")
     
     # TODO: Create or get user
     dummy_user_id = 1
     
-    # Store social account
-    crud.create_or_update_social_account(
+    # Store social account (the first DB use: no connection is held during the token exchange)
+    await crud.create_or_update_social_account_async(
         db=db,
         user_id=dummy_user_id,
         platform="youtube",
@@ -238,19 +259,30 @@ class UserLogin(BaseModel):
     email: str
     password: str
 
+def _hashing_busy():
+    return HTTPException(
+        status_code=429,
+        detail="Too many authentication requests, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post('/register')
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
-    from backend.app.core.auth import hash_password
-    
-    # Check if user exists
-    existing_user = crud.get_user_by_email(db, user.email)
+    # Check if user exists (on the primary, so a just-registered email is seen)
+    existing_user = await crud.get_user_by_email_async(db, user.email, use_replica=False)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Create user
-    hashed_password = hash_password(user.password)
-    new_user = crud.create_user(
+    # No connection is held while the hash waits for and runs in the process pool;
+    # the session checks out a new one for create_user_async
+    await release_db_connection(db)
+    
+    # Create user (bcrypt runs in the hashing process pool)
+    try:
+        hashed_password = await hash_password_async(user.password)
+    except PasswordHashingBusy:
+        raise _hashing_busy()
+    new_user = await crud.create_user_async(
         db=db,
         username=user.username,
         email=user.email,
@@ -267,19 +299,27 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.post('/login')
-def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Login user"""
-    from backend.app.core.auth import verify_password
-    
     # Get user
-    db_user = crud.get_user_by_email(db, user.email)
+    db_user = await crud.get_user_by_email_async(db, user.email)
     if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    
-    # Verify password
-    if not verify_password(user.password, db_user.hashed_password):
+    # No connection is held during verification (db_user stays readable, detached)
+    await release_db_connection(db)
+    
+    # Verify password (bcrypt runs in the hashing process pool)
+    try:
+        is_valid, new_hash = await verify_and_update_password_async(user.password, db_user.hashed_password)
+    except PasswordHashingBusy:
+        raise _hashing_busy()
+    if not is_valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    # Stored hash used an outdated bcrypt cost; replace it transparently
+    if new_hash:
+        await crud.update_user_password_async(db, db_user, new_hash)
+    
     # Create JWT token
     jwt_token = create_access_token({"user_id": db_user.id})
     
@@ -287,4 +327,4 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
         "message": "Login successful",
         "access_token": jwt_token,
         "user_id": db_user.id
-    }
\ No newline at end of file
+    }
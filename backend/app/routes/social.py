@@ -1,144 +1,342 @@
-import requests
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Optional
 from fastapi import APIRouter, Request, Depends, HTTPException
-from sqlalchemy.orm import Session
-from backend.app.core.database import SessionLocal
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.core.auth import get_current_user_id
+from backend.app.core.cache import cached_response
+from backend.app.core.database import get_async_db, release_db_connection
+from backend.app.core.http import http_client, http_clients
+from backend.app.core.pagination import paginate, instagram_next_page, twitter_next_page, ndjson_stream
+from backend.app.core.rate_limit import RateLimited, quota_status
+from backend.app.core.singleflight import coalesced
 from backend.app.db import crud
 import httpx
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Helper function to get token from database
-def get_token_from_db(db: Session, user_id: int, platform: str):
-    account = crud.get_social_account(db, user_id, platform)
+# Helper function to get the account's token and ID (cached in-process, see crud).
+# The lookup is the only DB work of a /social request, so the connection goes
+# back to the pool before the handler awaits the upstream API.
+async def get_account_from_db(db: AsyncSession, user_id: int, platform: str):
+    account = await crud.get_social_account_credentials_async(db, user_id, platform)
+    await release_db_connection(db)
     if not account:
         raise HTTPException(status_code=404, detail=f"{platform} account not connected")
-    return account.access_token
+    return account
+
+# Helper function to read an upstream response, refusing to pass on (or cache) API errors
+def upstream_json(res: httpx.Response, platform: str):
+    if res.is_error:
+        raise HTTPException(status_code=502, detail=f"{platform} API request failed ({res.status_code})")
+    return res.json()
+
+# ==================== Upstream Fetchers ====================
+# One coroutine per upstream call, shared by the single-platform routes and /overview.
+# Each takes the account's credentials (access_token, account_id) and is coalesced
+# so concurrent requests for the same account make a single upstream call.
+
+@coalesced("instagram", "insights")
+async def fetch_ig_insights(client: httpx.AsyncClient, account):
+    url = f"https://graph.instagram.com/me/media?fields=id,caption,media_type,media_url,timestamp,like_count,comments_count&access_token={account.access_token}"
+    res = await client.get(url)
+    data = upstream_json(res, "instagram")
+    return {"posts": data.get("data", [])}
+
+@coalesced("instagram", "profile")
+async def fetch_ig_profile(client: httpx.AsyncClient, account):
+    url = f"https://graph.instagram.com/me?fields=id,username,account_type,media_count&access_token={account.access_token}"
+    res = await client.get(url)
+    return upstream_json(res, "instagram")
+
+@coalesced("twitter", "tweets")
+async def fetch_twitter_tweets(client: httpx.AsyncClient, account):
+    url = f"https://api.twitter.com/2/users/{account.account_id}/tweets?tweet.fields=created_at,public_metrics"
+    res = await client.get(url, headers={"Authorization": f"Bearer {account.access_token}"})
+    data = upstream_json(res, "twitter")
+    return {"tweets": data.get("data", [])}
+
+@coalesced("twitter", "profile")
+async def fetch_twitter_profile(client: httpx.AsyncClient, account):
+    url = "https://api.twitter.com/2/users/me?user.fields=created_at,description,public_metrics"
+    res = await client.get(url, headers={"Authorization": f"Bearer {account.access_token}"})
+    data = upstream_json(res, "twitter")
+    return data.get("data", {})
+
+@coalesced("youtube", "videos")
+async def fetch_youtube_videos(client: httpx.AsyncClient, account):
+    url = f"https://www.googleapis.com/youtube/v3/search?part=snippet&channelId={account.account_id}&maxResults=25&order=date&type=video"
+    res = await client.get(url, headers={"Authorization": f"Bearer {account.access_token}"})
+    data = upstream_json(res, "youtube")
+    return {"videos": data.get("items", [])}
+
+@coalesced("youtube", "analytics")
+async def fetch_youtube_analytics(client: httpx.AsyncClient, account):
+    # Get channel statistics
+    url = f"https://www.googleapis.com/youtube/v3/channels?part=statistics&id={account.account_id}"
+    res = await client.get(url, headers={"Authorization": f"Bearer {account.access_token}"})
+    data = upstream_json(res, "youtube")
+    return {"analytics": data.get("items", [{}])[0].get("statistics", {})}
 
 # ==================== Instagram Analytics ====================
 
 @router.get('/instagram/insights')
-async def get_ig_insights(user_id: int, db: Session = Depends(get_db)):
+async def get_ig_insights(
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    client: httpx.AsyncClient = Depends(http_client("instagram")),
+):
     """Get Instagram media insights"""
-    token = get_token_from_db(db, user_id, "instagram")
-    
-    url = f"https://graph.instagram.com/me/media?fields=id,caption,media_type,media_url,timestamp,like_count,comments_count&access_token={token}"
-    
-    async with httpx.AsyncClient() as client:
-        res = await client.get(url)
-        data = res.json()
-    
-    return {"posts": data.get("data", [])}
+    account = await get_account_from_db(db, user_id, "instagram")
+
+    return await cached_response(
+        user_id, "instagram", "insights",
+        lambda: fetch_ig_insights(client, account)
+    )
+
+@router.get('/instagram/media/stream')
+async def stream_ig_media(
+    user_id: int = Depends(get_current_user_id),
+    max_items: Optional[int] = None,
+    since: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    client: httpx.AsyncClient = Depends(http_client("instagram")),
+):
+    """Stream the full Instagram media history as NDJSON, newest first"""
+    token = (await get_account_from_db(db, user_id, "instagram")).access_token
+
+    posts = paginate(
+        client,
+        "https://graph.instagram.com/me/media",
+        instagram_next_page,
+        "instagram",
+        params={
+            "fields": "id,caption,media_type,media_url,timestamp,like_count,comments_count",
+            "limit": 100,
+            "access_token": token,
+        },
+        max_items=max_items,
+        since=since,
+        timestamp_field="timestamp",
+    )
+    return StreamingResponse(ndjson_stream(posts), media_type="application/x-ndjson")
 
 @router.get('/instagram/profile')
-async def get_ig_profile(user_id: int, db: Session = Depends(get_db)):
+async def get_ig_profile(
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    client: httpx.AsyncClient = Depends(http_client("instagram")),
+):
     """Get Instagram profile information"""
-    token = get_token_from_db(db, user_id, "instagram")
-    
-    url = f"https://graph.instagram.com/me?fields=id,username,account_type,media_count&access_token={token}"
-    
-    async with httpx.AsyncClient() as client:
-        res = await client.get(url)
-        data = res.json()
-    
-    return data
+    account = await get_account_from_db(db, user_id, "instagram")
+
+    return await fetch_ig_profile(client, account)
 
 # ==================== Twitter Analytics ====================
 
 @router.get('/twitter/tweets')
-async def get_twitter_tweets(user_id: int, db: Session = Depends(get_db)):
+async def get_twitter_tweets(
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    client: httpx.AsyncClient = Depends(http_client("twitter")),
+):
     """Get user's recent tweets"""
-    token = get_token_from_db(db, user_id, "twitter")
-    account = crud.get_social_account(db, user_id, "twitter")
-    twitter_user_id = account.account_id
-    
-    url = f"https://api.twitter.com/2/users/{twitter_user_id}/tweets?tweet.fields=created_at,public_metrics"
-    
-    async with httpx.AsyncClient() as client:
-        res = await client.get(
-            url,
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        data = res.json()
-    
-    return {"tweets": data.get("data", [])}
+    account = await get_account_from_db(db, user_id, "twitter")
+
+    return await cached_response(
+        user_id, "twitter", "tweets",
+        lambda: fetch_twitter_tweets(client, account)
+    )
+
+@router.get('/twitter/tweets/stream')
+async def stream_twitter_tweets(
+    user_id: int = Depends(get_current_user_id),
+    max_items: Optional[int] = None,
+    since: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    client: httpx.AsyncClient = Depends(http_client("twitter")),
+):
+    """Stream the full tweet timeline as NDJSON, newest first"""
+    account = await get_account_from_db(db, user_id, "twitter")
+    token = account.access_token
+
+    params = {"tweet.fields": "created_at,public_metrics", "max_results": 100}
+    if since is not None:
+        # Let Twitter filter server-side too; paginate still enforces the cut-off
+        since_utc = since.astimezone(timezone.utc) if since.tzinfo else since
+        params["start_time"] = since_utc.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    tweets = paginate(
+        client,
+        f"https://api.twitter.com/2/users/{account.account_id}/tweets",
+        twitter_next_page,
+        "twitter",
+        params=params,
+        headers={"Authorization": f"Bearer {token}"},
+        max_items=max_items,
+        since=since,
+        timestamp_field="created_at",
+    )
+    return StreamingResponse(ndjson_stream(tweets), media_type="application/x-ndjson")
 
 @router.get('/twitter/profile')
-async def get_twitter_profile(user_id: int, db: Session = Depends(get_db)):
+async def get_twitter_profile(
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    client: httpx.AsyncClient = Depends(http_client("twitter")),
+):
     """Get Twitter profile information"""
-    token = get_token_from_db(db, user_id, "twitter")
-    
-    url = "https://api.twitter.com/2/users/me?user.fields=created_at,description,public_metrics"
-    
-    async with httpx.AsyncClient() as client:
-        res = await client.get(
-            url,
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        data = res.json()
-    
-    return data.get("data", {})
+    account = await get_account_from_db(db, user_id, "twitter")
+
+    return await fetch_twitter_profile(client, account)
 
 # ==================== YouTube Analytics ====================
 
 @router.get('/youtube/videos')
-async def get_youtube_videos(user_id: int, db: Session = Depends(get_db)):
+async def get_youtube_videos(
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    client: httpx.AsyncClient = Depends(http_client("youtube")),
+):
     """Get YouTube channel videos"""
-    token = get_token_from_db(db, user_id, "youtube")
-    account = crud.get_social_account(db, user_id, "youtube")
-    channel_id = account.account_id
-    
-    url = f"https://www.googleapis.com/youtube/v3/search?part=snippet&channelId={channel_id}&maxResults=25&order=date&type=video"
-    
-    async with httpx.AsyncClient() as client:
-        res = await client.get(
-            url,
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        data = res.json()
-    
-    return {"videos": data.get("items", [])}
+    account = await get_account_from_db(db, user_id, "youtube")
+
+    return await cached_response(
+        user_id, "youtube", "videos",
+        lambda: fetch_youtube_videos(client, account)
+    )
 
 @router.get('/youtube/analytics')
-async def get_youtube_analytics(user_id: int, db: Session = Depends(get_db)):
+async def get_youtube_analytics(
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    client: httpx.AsyncClient = Depends(http_client("youtube")),
+):
     """Get YouTube channel analytics"""
-    token = get_token_from_db(db, user_id, "youtube")
-    account = crud.get_social_account(db, user_id, "youtube")
-    channel_id = account.account_id
-    
-    # Get channel statistics
-    url = f"https://www.googleapis.com/youtube/v3/channels?part=statistics&id={channel_id}"
-    
-    async with httpx.AsyncClient() as client:
-        res = await client.get(
-            url,
-            headers={"Authorization": f"Bearer {token}"}
+    account = await get_account_from_db(db, user_id, "youtube")
+
+    return await cached_response(
+        user_id, "youtube", "analytics",
+        lambda: fetch_youtube_analytics(client, account)
+    )
+
+# ==================== Cross-Platform Overview ====================
+
+# Default per-platform budget (seconds), overridable with OVERVIEW_TIMEOUT_<PLATFORM>
+OVERVIEW_TIMEOUTS = {
+    "instagram": 5.0,
+    "twitter": 5.0,
+    "youtube": 5.0,
+}
+
+async def _platform_overview(user_id: int, account, client: httpx.AsyncClient):
+    """Fetch profile and metrics for one connected account concurrently"""
+    if account.platform == "instagram":
+        profile, metrics = await asyncio.gather(
+            fetch_ig_profile(client, account),
+            cached_response(user_id, "instagram", "insights", lambda: fetch_ig_insights(client, account)),
         )
-        data = res.json()
-    
-    return {"analytics": data.get("items", [{}])[0].get("statistics", {})}
+    elif account.platform == "twitter":
+        profile, metrics = await asyncio.gather(
+            fetch_twitter_profile(client, account),
+            cached_response(user_id, "twitter", "tweets", lambda: fetch_twitter_tweets(client, account)),
+        )
+    else:
+        profile, metrics = await asyncio.gather(
+            cached_response(user_id, "youtube", "analytics", lambda: fetch_youtube_analytics(client, account)),
+            cached_response(user_id, "youtube", "videos", lambda: fetch_youtube_videos(client, account)),
+        )
+
+    return {"profile": profile, "metrics": metrics}
+
+@router.get('/overview')
+async def get_overview(
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    clients: dict = Depends(http_clients),
+):
+    """
+    Get profile and metrics for every connected platform in one call
+
+    Platforms are fetched concurrently, each within its own timeout, so the
+    response takes as long as the slowest platform. A failing platform does not
+    fail the request; its entry reports a status of "error", "timeout" or
+    "rate_limited".
+    """
+    # One query for every connected account, then free the connection
+    accounts = {
+        account.platform: account
+        for account in await crud.get_social_accounts_async(db, user_id)
+    }
+    await release_db_connection(db)
+
+    platforms = list(OVERVIEW_TIMEOUTS)
+    connected = [platform for platform in platforms if platform in accounts]
+
+    results = await asyncio.gather(
+        *(
+            asyncio.wait_for(
+                _platform_overview(user_id, accounts[platform], clients[platform]),
+                timeout=float(os.getenv(f"OVERVIEW_TIMEOUT_{platform.upper()}", OVERVIEW_TIMEOUTS[platform])),
+            )
+            for platform in connected
+        ),
+        return_exceptions=True,
+    )
+
+    overview = {platform: {"status": "not_connected"} for platform in platforms}
+    for platform, result in zip(connected, results):
+        if isinstance(result, asyncio.TimeoutError):
+            overview[platform] = {"status": "timeout"}
+        elif isinstance(result, RateLimited):
+            overview[platform] = {"status": "rate_limited", "retry_after": result.retry_after}
+        elif isinstance(result, HTTPException):
+            overview[platform] = {"status": "error", "error": result.detail}
+        elif isinstance(result, Exception):
+            overview[platform] = {"status": "error", "error": str(result) or type(result).__name__}
+        else:
+            overview[platform] = {"status": "ok", **result}
+
+    return {"platforms": overview}
+
+# ==================== Upstream Quota ====================
+
+@router.get('/quota')
+async def get_quota(
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Get remaining outbound API quota for each connected platform"""
+    accounts = await crud.get_social_accounts_async(db, user_id)
+    await release_db_connection(db)
+
+    # One Redis round-trip per platform, all in flight at once
+    statuses = await asyncio.gather(
+        *(quota_status(account.platform, account.access_token) for account in accounts)
+    )
+    return {"quota": {account.platform: status for account, status in zip(accounts, statuses)}}
 
 # ==================== Connected Accounts ====================
 
 @router.get('/connected-accounts')
-def get_connected_accounts(user_id: int, db: Session = Depends(get_db)):
+async def get_connected_accounts(
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db),
+):
     """Get all connected social accounts for a user"""
-    user = crud.get_user(db, user_id)
+    user = await crud.get_user_async(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
+
     accounts = []
-    for account in user.social_accounts:
+    # Only lists the accounts, so the (possibly lagging) replica is fine
+    for account in await crud.get_social_accounts_async(db, user_id, use_replica=True):
         accounts.append({
             "platform": account.platform,
             "account_id": account.account_id,
             "connected": True
         })
-    
+
     return {"connected_accounts": accounts}
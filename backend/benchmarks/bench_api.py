@@ -0,0 +1,318 @@
+"""
+API Latency Benchmark
+
+Runs the FastAPI app in-process and drives its routes with concurrent
+requests, reporting throughput, latency percentiles (p50/p90/p99), and the
+SQL queries, connection-pool wait and upstream calls per request. Nothing
+leaves the machine:
+- The app is called through httpx.ASGITransport (no server or sockets)
+- The platform APIs are faked with httpx.MockTransport, with configurable
+  injected latency
+- The database is SQLite by default (requires `aiosqlite` for the async
+  engine), or any DATABASE_URL (e.g. a local Postgres)
+- Redis is the one configured with REDIS_HOST, or an in-memory fake with
+  --fake-redis (requires `fakeredis`)
+
+Results are written as JSON. Pass --compare with an earlier result file to
+print the change per route.
+
+Install the benchmark extras, then run from the repository root:
+    pip install -r backend/benchmarks/requirements.txt
+    python -m backend.benchmarks.bench_api --concurrency 20 --requests 500 \\
+        --upstream-latency 80 --output bench.json
+    python -m backend.benchmarks.bench_api --compare bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform as platform_info
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+PASSWORD = "benchmark-password"
+
+# Benchmark name -> (method, path)
+ROUTES = {
+    "auth_register": ("POST", "/auth/register"),
+    "auth_login": ("POST", "/auth/login"),
+    "instagram_insights": ("GET", "/social/instagram/insights"),
+    "instagram_profile": ("GET", "/social/instagram/profile"),
+    "twitter_tweets": ("GET", "/social/twitter/tweets"),
+    "twitter_profile": ("GET", "/social/twitter/profile"),
+    "youtube_videos": ("GET", "/social/youtube/videos"),
+    "youtube_analytics": ("GET", "/social/youtube/analytics"),
+    "overview": ("GET", "/social/overview"),
+    "connected_accounts": ("GET", "/social/connected-accounts"),
+}
+
+
+def _configure_environment(args):
+    """Set the app's configuration; must run before the app is imported"""
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="influnce-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    os.environ["PASSWORD_HASH_MAX_PENDING"] = str(max(args.concurrency, 1) * 4)
+    # The benchmark measures the app, not the platforms' quotas
+    for name in ("INSTAGRAM", "TWITTER", "YOUTUBE"):
+        os.environ[f"RATE_LIMIT_{name}_APP"] = "1000000000/1"
+        os.environ[f"RATE_LIMIT_{name}_TOKEN"] = "1000000000/1"
+
+
+def _use_fake_redis():
+    """Point the app's Redis clients at in-memory fakes; must run before the app is imported"""
+    import fakeredis
+    from backend.app.core import redis as redis_module
+
+    sync_client = fakeredis.FakeRedis(decode_responses=True)
+    async_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    def init_async_redis():
+        redis_module._async_client = async_client
+        return async_client
+
+    redis_module.get_redis_client = lambda: sync_client
+    redis_module.init_async_redis = init_async_redis
+
+
+def _upstream_handler(latency_ms: float, jitter_ms: float):
+    """MockTransport handler answering like the platform APIs after a delay"""
+    async def handler(request):
+        import httpx
+
+        delay = latency_ms + random.uniform(-jitter_ms, jitter_ms)
+        await asyncio.sleep(max(0.0, delay) / 1000)
+
+        path = request.url.path
+        if path.endswith("/media"):
+            body = {"data": [{"id": str(i), "like_count": i, "timestamp": "2024-01-01T00:00:00+0000"} for i in range(25)]}
+        elif path.endswith("/tweets"):
+            body = {"data": [{"id": str(i), "public_metrics": {"like_count": i}} for i in range(25)]}
+        elif path.endswith("/search"):
+            body = {"items": [{"id": {"videoId": f"v{i}"}, "snippet": {"title": f"Video {i}"}} for i in range(25)]}
+        elif path.endswith("/channels"):
+            body = {"items": [{"statistics": {"viewCount": "1000", "subscriberCount": "10"}}]}
+        else:
+            body = {"id": "1", "username": "benchmark", "data": {"id": "1", "username": "benchmark"}}
+        return httpx.Response(200, json=body)
+    return handler
+
+
+def _seed(users: int, run_id: str):
+    """Create benchmark users with every platform connected; returns their (id, email)"""
+    from backend.app.core.auth import hash_password
+    from backend.app.core.database import Base, SessionLocal, get_engine
+    from backend.app.db import models
+
+    Base.metadata.create_all(get_engine())
+    hashed = hash_password(PASSWORD)
+    seeded = []
+    db = SessionLocal()
+    try:
+        for index in range(users):
+            email = f"bench-{run_id}-{index}@example.com"
+            user = models.User(username=f"bench-{run_id}-{index}", email=email, hashed_password=hashed)
+            db.add(user)
+            db.flush()
+            for platform in ("instagram", "twitter", "youtube"):
+                db.add(models.SocialAccount(
+                    user_id=user.id,
+                    platform=platform,
+                    account_id=f"{platform}-{run_id}-{index}",
+                    access_token=f"token-{run_id}-{index}",
+                ))
+            seeded.append((user.id, email))
+        db.commit()
+    finally:
+        db.close()
+    return seeded
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def _bench_route(client, name, requests, concurrency, users, tokens, run_id):
+    from backend.app.core.metrics import DB_POOL_WAIT, DB_QUERY_DURATION, UPSTREAM_REQUESTS
+
+    method, path = ROUTES[name]
+    latencies = []
+    statuses = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for number in counter:
+            user_id, email = random.choice(users)
+            kwargs = {}
+            if name == "auth_register":
+                unique = f"{run_id}-r{number}"
+                kwargs["json"] = {"username": f"bench-{unique}", "email": f"bench-{unique}@example.com", "password": PASSWORD}
+            elif name == "auth_login":
+                kwargs["json"] = {"email": email, "password": PASSWORD}
+            else:
+                kwargs["headers"] = {"Authorization": f"Bearer {tokens[user_id]}"}
+
+            started = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    queries_before, query_seconds_before = DB_QUERY_DURATION.total()
+    upstream_before = UPSTREAM_REQUESTS.total()
+    _, pool_wait_before = DB_POOL_WAIT.total()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    queries_after, query_seconds_after = DB_QUERY_DURATION.total()
+    upstream_after = UPSTREAM_REQUESTS.total()
+    _, pool_wait_after = DB_POOL_WAIT.total()
+
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "method": method,
+        "path": path,
+        "requests": count,
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(1000 * statistics.fmean(latencies), 2) if latencies else 0.0,
+            "p50": round(1000 * _percentile(latencies, 0.50), 2),
+            "p90": round(1000 * _percentile(latencies, 0.90), 2),
+            "p99": round(1000 * _percentile(latencies, 0.99), 2),
+            "max": round(1000 * latencies[-1], 2) if latencies else 0.0,
+        },
+        "status_counts": {str(status): n for status, n in sorted(statuses.items())},
+        "db_queries_per_request": round((queries_after - queries_before) / count, 2) if count else 0.0,
+        "db_ms_per_request": round(1000 * (query_seconds_after - query_seconds_before) / count, 3) if count else 0.0,
+        "db_pool_wait_ms_per_request": round(1000 * (pool_wait_after - pool_wait_before) / count, 3) if count else 0.0,
+        "upstream_calls_per_request": round((upstream_after - upstream_before) / count, 2) if count else 0.0,
+    }
+
+
+async def _run(args):
+    import httpx
+    from backend.app.core.auth import create_access_token
+    from backend.app.main import app
+
+    run_id = uuid.uuid4().hex[:8]
+    users = _seed(args.users, run_id)
+    tokens = {user_id: create_access_token({"user_id": user_id}) for user_id, _ in users}
+    handler = _upstream_handler(args.upstream_latency, args.upstream_jitter)
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        # Swap the transports but keep the event hooks (rate limiter, metrics)
+        for platform, real_client in list(app.state.http_clients.items()):
+            app.state.http_clients[platform] = httpx.AsyncClient(
+                transport=httpx.MockTransport(handler),
+                event_hooks=real_client.event_hooks,
+            )
+            await real_client.aclose()
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            for name in args.routes:
+                # Warm up connections, pools and caches before timing
+                await _bench_route(client, name, min(args.concurrency, args.requests), args.concurrency, users, tokens, run_id + "w")
+                results[name] = await _bench_route(client, name, args.requests, args.concurrency, users, tokens, run_id)
+                _print_route(name, results[name])
+    return results
+
+
+def _print_route(name, result):
+    latency = result["latency_ms"]
+    print(
+        f"{name:<20} {result['throughput_rps']:>9.1f} req/s  "
+        f"p50 {latency['p50']:>8.2f}ms  p90 {latency['p90']:>8.2f}ms  p99 {latency['p99']:>8.2f}ms  "
+        f"db {result['db_queries_per_request']:>5.2f}q  upstream {result['upstream_calls_per_request']:>5.2f}  "
+        f"status {result['status_counts']}"
+    )
+
+
+def _compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["routes"]
+
+    def change(new, old):
+        return f"{100 * (new - old) / old:+.1f}%" if old else "n/a"
+
+    print(f"\nChange vs {baseline_path}:")
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        print(
+            f"{name:<20} throughput {change(result['throughput_rps'], old['throughput_rps']):>8}  "
+            f"p50 {change(result['latency_ms']['p50'], old['latency_ms']['p50']):>8}  "
+            f"p99 {change(result['latency_ms']['p99'], old['latency_ms']['p99']):>8}  "
+            f"db queries {old['db_queries_per_request']} -> {result['db_queries_per_request']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API latency in-process against faked upstreams")
+    parser.add_argument("--routes", default=",".join(ROUTES), help=f"comma-separated subset of: {', '.join(ROUTES)}")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per route")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight at once")
+    parser.add_argument("--users", type=int, default=20, help="seeded users with connected accounts")
+    parser.add_argument("--upstream-latency", type=float, default=50.0, help="injected platform API latency (ms)")
+    parser.add_argument("--upstream-jitter", type=float, default=10.0, help="random +/- jitter on that latency (ms)")
+    parser.add_argument("--database-url", help="database to use (default: a fresh SQLite file)")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="bcrypt cost for register/login (BCRYPT_ROUNDS)")
+    parser.add_argument("--fake-redis", action="store_true", help="use an in-memory Redis (needs fakeredis)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="earlier JSON result to compare against")
+    args = parser.parse_args()
+
+    args.routes = [name.strip() for name in args.routes.split(",") if name.strip()]
+    unknown = [name for name in args.routes if name not in ROUTES]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+
+    _configure_environment(args)
+    if args.fake_redis:
+        _use_fake_redis()
+
+    results = asyncio.run(_run(args))
+
+    if args.output:
+        report = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform_info.python_version(),
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "config": {
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "users": args.users,
+                "upstream_latency_ms": args.upstream_latency,
+                "upstream_jitter_ms": args.upstream_jitter,
+                "bcrypt_rounds": args.bcrypt_rounds,
+                "fake_redis": args.fake_redis,
+            },
+            "routes": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        _compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
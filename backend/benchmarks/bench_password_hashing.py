@@ -0,0 +1,64 @@
+"""
+Password Hashing Benchmark
+
+Measures login throughput of the bcrypt hashing process pool: how many
+password verifications per second the pool sustains in total and per core.
+Use it to choose BCRYPT_ROUNDS and PASSWORD_HASH_WORKERS for a deployment.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_password_hashing --rounds 12 --workers 4 --logins 200
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+
+async def _run(logins: int, concurrency: int):
+    from backend.app.core import auth
+
+    stored_hash = auth.hash_password("benchmark-password")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_login():
+        async with semaphore:
+            is_valid, _ = await auth.verify_and_update_password_async("benchmark-password", stored_hash)
+            assert is_valid
+
+    # Warm up so process start-up is not counted
+    await asyncio.gather(*(one_login() for _ in range(auth.PASSWORD_HASH_WORKERS)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    auth.shutdown_hash_pool()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bcrypt login throughput")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost (BCRYPT_ROUNDS)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="hashing processes (PASSWORD_HASH_WORKERS)")
+    parser.add_argument("--logins", type=int, default=100, help="number of logins to time")
+    args = parser.parse_args()
+
+    # The auth module reads its configuration at import time
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    os.environ["PASSWORD_HASH_MAX_PENDING"] = str(args.workers * 4)
+
+    elapsed = asyncio.run(_run(args.logins, concurrency=args.workers * 4))
+
+    per_second = args.logins / elapsed
+    print(f"bcrypt rounds:    {args.rounds}")
+    print(f"workers:          {args.workers}")
+    print(f"logins:           {args.logins} in {elapsed:.2f}s")
+    print(f"logins/sec:       {per_second:.1f}")
+    print(f"logins/sec/core:  {per_second / args.workers:.1f}")
+    print(f"ms per login:     {1000 * elapsed / args.logins * args.workers:.1f} (per core)")
+
+
+if __name__ == "__main__":
+    main()
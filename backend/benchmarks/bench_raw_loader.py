@@ -0,0 +1,123 @@
+"""
+Raw Payload Loader Benchmark
+
+Compares the ETL's bulk COPY loader (etl/helpers/db.py) with the previous
+row-by-row path (one INSERT ... ON CONFLICT round-trip per post) in rows/sec,
+for fresh rows and for re-loading rows that already exist unchanged.
+
+Needs a Postgres reachable with the ETL's DB_* settings. Everything runs in a
+scratch schema (dropped afterwards), so the real raw_* tables are untouched.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_raw_loader --rows 20000 --chunk-rows 5000
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import sys
+import time
+
+# The ETL is imported as `etl.helpers...` from the backend directory
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+SCHEMA = "etl_loader_benchmark"
+
+
+def _row_by_row(table, key_column, rows):
+    """The previous loader: one connection per call, one INSERT per row"""
+    from etl.helpers.db import conn
+
+    c = conn()
+    cur = c.cursor()
+    for key, payload in rows:
+        cur.execute(f"""
+        INSERT INTO {table} ({key_column}, raw_json)
+        VALUES (%s, %s)
+        ON CONFLICT({key_column}) DO NOTHING;
+        """, (key, json.dumps(payload)))
+    c.commit()
+    c.close()
+
+
+def _posts(prefix, count):
+    return [
+        (f"{prefix}-{i}", {
+            "id": f"{prefix}-{i}",
+            "caption": f"Post {i} with \"quotes\", commas and a backslash \\\\ #benchmark",
+            "media_type": "IMAGE",
+            "like_count": i % 1000,
+            "comments_count": i % 50,
+            "timestamp": "2024-01-01T12:00:00+0000",
+        })
+        for i in range(count)
+    ]
+
+
+def _timed(load, rows):
+    started = time.perf_counter()
+    load(rows)
+    elapsed = time.perf_counter() - started
+    return round(len(rows) / elapsed, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL raw payload loaders")
+    parser.add_argument("--rows", type=int, default=20000, help="rows per run")
+    parser.add_argument("--chunk-rows", type=int, default=5000, help="rows per COPY batch")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    # Every connection the loaders open uses the scratch schema
+    os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA}"
+    from etl.helpers.db import INSTAGRAM_RAW, bulk_load_raw, conn
+
+    c = conn()
+    c.cursor().execute(f"""
+    DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+    CREATE SCHEMA {SCHEMA};
+    CREATE TABLE {SCHEMA}.raw_instagram_posts (
+      post_id TEXT PRIMARY KEY, raw_json JSONB NOT NULL,
+      content_hash TEXT, loaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+      account_id TEXT, caption TEXT, media_type TEXT,
+      like_count BIGINT, comments_count BIGINT, posted_at TIMESTAMPTZ
+    );
+    CREATE TABLE {SCHEMA}.post_metric_snapshots (
+      platform TEXT NOT NULL, post_id TEXT NOT NULL, observed_at TIMESTAMPTZ NOT NULL,
+      likes BIGINT, comments BIGINT, views BIGINT
+    ) PARTITION BY RANGE (observed_at);
+    """)
+    c.commit()
+
+    def bulk(rows):
+        bulk_load_raw(INSTAGRAM_RAW, iter(rows), chunk_rows=args.chunk_rows)
+
+    def row_by_row(rows):
+        _row_by_row("raw_instagram_posts", "post_id", rows)
+
+    try:
+        results = {}
+        for name, load in (("row_by_row", row_by_row), ("bulk_copy", bulk)):
+            rows = _posts(name, args.rows)
+            results[name] = {
+                "new_rows_per_sec": _timed(load, rows),
+                "existing_rows_per_sec": _timed(load, rows),
+            }
+    finally:
+        c.cursor().execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;")
+        c.commit()
+        c.close()
+
+    for name, result in results.items():
+        print(f"{name:<12} new rows: {result['new_rows_per_sec']:>10.1f}/s   existing rows: {result['existing_rows_per_sec']:>10.1f}/s")
+    speedup = results["bulk_copy"]["new_rows_per_sec"] / results["row_by_row"]["new_rows_per_sec"]
+    print(f"bulk speedup (new rows): {speedup:.1f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rows": args.rows, "chunk_rows": args.chunk_rows, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+CREATE TABLE IF NOT EXISTS raw_instagram_posts (
   post_id TEXT PRIMARY KEY,
   raw_json JSONB NOT NULL
 );
@@ -0,0 +1,10 @@
+-- Newest item already loaded per account, so extraction only asks for newer content
+-- Existing databases get this from the Alembic migration 3b91d0c5e8a2.
+CREATE TABLE IF NOT EXISTS etl_watermarks (
+  platform TEXT NOT NULL,
+  account_id TEXT NOT NULL,
+  last_seen_at TIMESTAMPTZ NOT NULL,
+  cursor TEXT,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (platform, account_id)
+);
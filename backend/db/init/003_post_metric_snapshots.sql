@@ -0,0 +1,28 @@
+-- Raw payloads are rewritten only when their content hash changes
+-- Existing databases get these from the Alembic migration c5e07f3a91b4.
+ALTER TABLE raw_instagram_posts ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE raw_instagram_posts ADD COLUMN IF NOT EXISTS loaded_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE raw_youtube_stats ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE raw_youtube_stats ADD COLUMN IF NOT EXISTS loaded_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+-- Incremental dbt staging models select new raw rows by loaded_at
+-- Existing databases get these from the Alembic migration e2b6f4a8c1d7.
+CREATE INDEX IF NOT EXISTS raw_instagram_posts_loaded_at_idx ON raw_instagram_posts (loaded_at);
+CREATE INDEX IF NOT EXISTS raw_youtube_stats_loaded_at_idx ON raw_youtube_stats (loaded_at);
+
+-- Append-only history of engagement metrics, one row per observed change.
+-- Daily partitions (post_metric_snapshots_YYYYMMDD) are created by the ETL
+-- loader before it writes to them.
+CREATE TABLE IF NOT EXISTS post_metric_snapshots (
+  platform TEXT NOT NULL,
+  post_id TEXT NOT NULL,
+  observed_at TIMESTAMPTZ NOT NULL,
+  likes BIGINT,
+  comments BIGINT,
+  views BIGINT
+) PARTITION BY RANGE (observed_at);
+
+CREATE INDEX IF NOT EXISTS idx_post_metric_snapshots_observed_at
+  ON post_metric_snapshots USING BRIN (observed_at);
+CREATE INDEX IF NOT EXISTS idx_post_metric_snapshots_post
+  ON post_metric_snapshots (platform, post_id, observed_at);
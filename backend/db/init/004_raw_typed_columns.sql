@@ -0,0 +1,21 @@
+-- Typed copies of the hot payload fields, filled by the ETL loader so dbt
+-- models read narrow columns instead of parsing raw_json.
+-- Existing databases get these from the Alembic migration a7c4e2d91f36.
+ALTER TABLE raw_instagram_posts ADD COLUMN IF NOT EXISTS account_id TEXT;
+ALTER TABLE raw_instagram_posts ADD COLUMN IF NOT EXISTS caption TEXT;
+ALTER TABLE raw_instagram_posts ADD COLUMN IF NOT EXISTS media_type TEXT;
+ALTER TABLE raw_instagram_posts ADD COLUMN IF NOT EXISTS like_count BIGINT;
+ALTER TABLE raw_instagram_posts ADD COLUMN IF NOT EXISTS comments_count BIGINT;
+ALTER TABLE raw_instagram_posts ADD COLUMN IF NOT EXISTS posted_at TIMESTAMPTZ;
+CREATE INDEX IF NOT EXISTS idx_raw_instagram_posts_account_posted_at
+  ON raw_instagram_posts (account_id, posted_at);
+
+ALTER TABLE raw_youtube_stats ADD COLUMN IF NOT EXISTS account_id TEXT;
+ALTER TABLE raw_youtube_stats ADD COLUMN IF NOT EXISTS title TEXT;
+ALTER TABLE raw_youtube_stats ADD COLUMN IF NOT EXISTS media_type TEXT;
+ALTER TABLE raw_youtube_stats ADD COLUMN IF NOT EXISTS like_count BIGINT;
+ALTER TABLE raw_youtube_stats ADD COLUMN IF NOT EXISTS comments_count BIGINT;
+ALTER TABLE raw_youtube_stats ADD COLUMN IF NOT EXISTS view_count BIGINT;
+ALTER TABLE raw_youtube_stats ADD COLUMN IF NOT EXISTS posted_at TIMESTAMPTZ;
+CREATE INDEX IF NOT EXISTS idx_raw_youtube_stats_account_posted_at
+  ON raw_youtube_stats (account_id, posted_at);
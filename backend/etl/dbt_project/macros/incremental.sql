@@ -0,0 +1,13 @@
+{#
+    Incremental filter: rows loaded since this model's newest loaded_at, minus
+    the lookback_hours window. `where` narrows the model rows the high-water
+    mark is taken from (e.g. one platform of a model unioning several).
+#}
+{% macro loaded_since_last_run(where=none) %}
+    {%- if is_incremental() -%}
+    where loaded_at > (
+        select coalesce(max(loaded_at), '-infinity') from {{ this }}
+        {%- if where %} where {{ where }}{% endif %}
+    ) - interval '{{ var("lookback_hours") }} hours'
+    {%- endif -%}
+{% endmacro %}
@@ -1,6 +1,48 @@
+{{
+    config(
+        unique_key=['platform', 'post_id'],
+        post_hook=[
+            "create unique index if not exists {{ this.name }}_post_idx on {{ this }} (platform, post_id)",
+            "create index if not exists {{ this.name }}_account_idx on {{ this }} (platform, account_id)",
+            "create index if not exists {{ this.name }}_loaded_at_idx on {{ this }} (loaded_at)",
+        ]
+    )
+}}
+
+with instagram as (
+    select
+        'instagram' as platform,
+        post_id,
+        account_id,
+        posted_at,
+        coalesce(likes, 0) + coalesce(comments, 0) as engagement,
+        loaded_at
+    from {{ ref('stg_instagram_posts') }}
+    {{ loaded_since_last_run("platform = 'instagram'") }}
+),
+
+youtube as (
+    select
+        'youtube' as platform,
+        video_id as post_id,
+        account_id,
+        posted_at,
+        coalesce(likes, 0) + coalesce(comments, 0) as engagement,
+        loaded_at
+    from {{ ref('stg_youtube_videos') }}
+    {{ loaded_since_last_run("platform = 'youtube'") }}
+)
+
 select
+    platform,
     post_id,
+    account_id,
     extract(hour from posted_at) as hour,
     extract(dow from posted_at) as weekday,
-    (likes + comments) as engagement
-from {{ ref('stg_instagram_posts') }}
+    engagement,
+    loaded_at
+from (
+    select * from instagram
+    union all
+    select * from youtube
+) posts
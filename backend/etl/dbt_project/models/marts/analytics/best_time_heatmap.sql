@@ -0,0 +1,96 @@
+-- Engagement heatmap per account: one row per (weekday, hour) UTC cell.
+-- Only accounts with new or changed posts are recomputed on incremental runs.
+{{
+    config(
+        unique_key=['platform', 'account_id', 'weekday', 'hour'],
+        post_hook=[
+            "create unique index if not exists {{ this.name }}_cell_idx on {{ this }} (platform, account_id, weekday, hour)",
+            "create index if not exists {{ this.name }}_loaded_at_idx on {{ this }} (platform, loaded_at)",
+        ]
+    )
+}}
+
+with posts as (
+    select
+        platform,
+        account_id,
+        (weekday::int * 24 + hour::int) as slot,
+        engagement,
+        loaded_at
+    from {{ ref('best_time_features') }}
+    where account_id is not null
+    {% if is_incremental() %}
+    and (platform, account_id) in (
+        {% for platform in ['instagram', 'youtube'] %}
+        select platform, account_id from {{ ref('best_time_features') }}
+        {{ loaded_since_last_run("platform = '" ~ platform ~ "'") }}
+        and platform = '{{ platform }}'
+        {% if not loop.last %}union{% endif %}
+        {% endfor %}
+    )
+    {% endif %}
+),
+
+accounts as (
+    select
+        platform,
+        account_id,
+        avg(engagement) as mean_engagement,
+        max(loaded_at) as loaded_at
+    from posts
+    group by 1, 2
+),
+
+cells as (
+    select platform, account_id, slot, count(*) as posts, sum(engagement) as engagement
+    from posts
+    group by 1, 2, 3
+),
+
+-- Each cell also contributes to the hours either side of it (wrapping
+-- around the week), which smooths out the hour-to-hour noise
+spread as (
+    select
+        platform,
+        account_id,
+        (slot + shift + 168) % 168 as slot,
+        shift,
+        case when shift = 0 then 1.0 else {{ var('heatmap_neighbour_weight') }} end as weight,
+        posts,
+        engagement
+    from cells
+    cross join (values (-1), (0), (1)) as shifts (shift)
+),
+
+smoothed as (
+    select
+        platform,
+        account_id,
+        slot,
+        coalesce(sum(posts) filter (where shift = 0), 0) as posts,
+        sum(weight * posts) as weighted_posts,
+        sum(weight * engagement) as weighted_engagement
+    from spread
+    group by 1, 2, 3
+),
+
+grid as (
+    select platform, account_id, slot
+    from accounts
+    cross join generate_series(0, 167) as slots (slot)
+)
+
+select
+    g.platform,
+    g.account_id,
+    g.slot / 24 as weekday,
+    g.slot % 24 as hour,
+    coalesce(s.posts, 0)::int as posts,
+    -- Shrunk toward the account's average so a single lucky post does not win
+    ((coalesce(s.weighted_engagement, 0) + {{ var('heatmap_prior_posts') }} * a.mean_engagement)
+        / (coalesce(s.weighted_posts, 0) + {{ var('heatmap_prior_posts') }}))::double precision as score,
+    coalesce(s.weighted_posts, 0) >= {{ var('heatmap_min_posts') }} as is_reliable,
+    a.loaded_at
+from grid g
+join accounts a on a.platform = g.platform and a.account_id = g.account_id
+left join smoothed s on s.platform = g.platform and s.account_id = g.account_id and s.slot = g.slot
@@ -0,0 +1,62 @@
+{{
+    config(
+        unique_key=['platform', 'post_id'],
+        post_hook=[
+            "create unique index if not exists {{ this.name }}_post_idx on {{ this }} (platform, post_id)",
+            "create index if not exists {{ this.name }}_account_posted_at_idx on {{ this }} (platform, account_id, posted_at)",
+            "create index if not exists {{ this.name }}_loaded_at_idx on {{ this }} (loaded_at)",
+        ]
+    )
+}}
+
+with instagram as (
+    select
+        'instagram' as platform,
+        post_id,
+        account_id,
+        media_type,
+        posted_at,
+        likes,
+        comments,
+        null::bigint as views,
+        caption as text,
+        loaded_at
+    from {{ ref('stg_instagram_posts') }}
+    {{ loaded_since_last_run("platform = 'instagram'") }}
+),
+
+youtube as (
+    select
+        'youtube' as platform,
+        video_id as post_id,
+        account_id,
+        media_type,
+        posted_at,
+        likes,
+        comments,
+        views,
+        title as text,
+        loaded_at
+    from {{ ref('stg_youtube_videos') }}
+    {{ loaded_since_last_run("platform = 'youtube'") }}
+)
+
+select
+    platform,
+    post_id,
+    account_id,
+    media_type,
+    posted_at,
+    coalesce(likes, 0) as likes,
+    coalesce(comments, 0) as comments,
+    views,
+    coalesce(likes, 0) + coalesce(comments, 0) as engagement,
+    case when views > 0 then (coalesce(likes, 0) + coalesce(comments, 0))::numeric / views end as engagement_rate,
+    coalesce(length(text), 0) as text_length,
+    coalesce(array_length(regexp_split_to_array(text, '#') , 1) - 1, 0) as hashtag_count,
+    loaded_at
+from (
+    select * from instagram
+    union all
+    select * from youtube
+) posts
@@ -1,7 +1,23 @@
+-- Typed columns are extracted by the ETL loader; raw_json is not parsed here
+{{
+    config(
+        unique_key='post_id',
+        post_hook=[
+            "create unique index if not exists {{ this.name }}_post_id_idx on {{ this }} (post_id)",
+            "create index if not exists {{ this.name }}_loaded_at_idx on {{ this }} (loaded_at)",
+        ]
+    )
+}}
+
 select
-    (raw_json->>'id') as post_id,
-    (raw_json->>'caption') as caption,
-    (raw_json->>'comments_count')::int as comments,
-    (raw_json->>'like_count')::int as likes,
-    (raw_json->>'timestamp')::timestamp as posted_at
-from raw_instagram_posts
+    post_id,
+    account_id,
+    caption,
+    media_type,
+    comments_count::int as comments,
+    like_count::int as likes,
+    (posted_at at time zone 'UTC') as posted_at,
+    loaded_at
+from {{ source('raw', 'raw_instagram_posts') }}
+
+{{ loaded_since_last_run() }}
@@ -0,0 +1,24 @@
+-- Typed columns are extracted by the ETL loader; raw_json is not parsed here
+{{
+    config(
+        unique_key='video_id',
+        post_hook=[
+            "create unique index if not exists {{ this.name }}_video_id_idx on {{ this }} (video_id)",
+            "create index if not exists {{ this.name }}_loaded_at_idx on {{ this }} (loaded_at)",
+        ]
+    )
+}}
+
+select
+    video_id,
+    account_id,
+    title,
+    media_type,
+    comments_count::int as comments,
+    like_count::int as likes,
+    view_count as views,
+    (posted_at at time zone 'UTC') as posted_at,
+    loaded_at
+from {{ source('raw', 'raw_youtube_stats') }}
+
+{{ loaded_since_last_run() }}
@@ -1,7 +1,39 @@
-import psycopg2
+"""
+Postgres access for the ETL.
+
+Every task in the process borrows connections from one thread-safe pool
+instead of connecting per call, so fanning out across many accounts reuses a
+bounded number of server backends:
+
+    with connection() as c:
+        c.cursor().execute(...)
+
+The block commits on success and rolls back on error. Idle connections are
+health-checked before reuse and recycled after ETL_DB_POOL_RECYCLE seconds;
+pool_stats() reports checkouts and time spent waiting for a free connection.
+"""
+import atexit
+import contextlib
+import csv
+import hashlib
+import io
 import json
+import logging
 import os
 import pathlib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, NamedTuple, Optional, Sequence
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.pool
+from psycopg2 import sql
+from psycopg2.extras import Json
+
+logger = logging.getLogger(__name__)
 
 def _load_env():
     root_env = pathlib.Path(__file__).resolve().parents[3] / ".env"
@@ -18,6 +50,7 @@ def _load_env():
 _load_env()
 
 def conn():
+    """Open a new, unpooled connection (prefer connection())"""
     return psycopg2.connect(
         host = os.getenv("DB_HOST"),
         database=os.getenv("DB_NAME"),
@@ -26,32 +59,515 @@ def conn():
         password = os.getenv("DB_PASS")
     )
 
-def insert_instagram_raw(posts):
-    c = conn()
-    cur = c.cursor()
 
-    for p in posts :
-        cur.execute("""
-        INSERT INTO raw_instagram_posts (post_id, raw_json)
-        VALUES (%s, %s)
-        ON CONFLICT(post_id) DO NOTHING;
-        """, (p["id"], json.dumps(p))
+class PoolTimeout(psycopg2.pool.PoolError):
+    """No connection became free within the pool timeout"""
+
+
+class ConnectionPool:
+    """
+    Thread-safe, bounded pool of psycopg2 connections.
+
+    Unlike psycopg2.pool.ThreadedConnectionPool, a checkout blocks (up to
+    timeout seconds) when all maxconn connections are in use instead of
+    failing immediately.
+    """
+
+    def __init__(self, minconn=1, maxconn=10, timeout=30.0, check_idle=30.0, recycle=1800.0, connect=conn):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self.recycle = recycle
+        self._connect = connect
+        self._cond = threading.Condition()
+        self._idle = []  # (connection, opened_at, returned_at)
+        self._opened_at = {}
+        self._size = 0
+        self._closed = False
+        self._stats = dict(
+            checkouts=0, waits=0, wait_seconds=0.0, max_wait_seconds=0.0,
+            timeouts=0, opened=0, discarded=0,
         )
+        for _ in range(minconn):
+            self._size += 1
+            c = self._open()
+            self._idle.append((c, self._opened_at[id(c)], time.monotonic()))
+
+    def _open(self):
+        """Connect into a slot the caller has already reserved (counted in _size)"""
+        try:
+            c = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opened_at[id(c)] = time.monotonic()
+            self._stats["opened"] += 1
+        return c
+
+    def _discard(self, c):
+        with self._cond:
+            self._size -= 1
+            self._opened_at.pop(id(c), None)
+            self._stats["discarded"] += 1
+            self._cond.notify()
+        try:
+            c.close()
+        except psycopg2.Error:
+            pass
+
+    def _healthy(self, c, opened_at, returned_at):
+        now = time.monotonic()
+        if c.closed or (self.recycle and now - opened_at > self.recycle):
+            return False
+        if now - returned_at < self.check_idle:
+            return True
+        try:
+            with c.cursor() as cur:
+                cur.execute("SELECT 1")
+            c.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Borrow a connection, waiting up to timeout seconds for a free one"""
+        started = time.monotonic()
+        waited = counted = False
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise psycopg2.pool.PoolError("connection pool is closed")
+                while not self._idle and self._size >= self.maxconn:
+                    waited = True
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"no database connection free after {self.timeout}s ({self.maxconn} in use)"
+                        )
+                    self._cond.wait(remaining)
+                if not counted:
+                    counted = True
+                    self._stats["checkouts"] += 1
+                    if waited:
+                        wait = time.monotonic() - started
+                        self._stats["waits"] += 1
+                        self._stats["wait_seconds"] += wait
+                        self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], wait)
+                idle = self._idle.pop() if self._idle else None
+                if idle is None:
+                    # Reserve the slot before connecting outside the lock
+                    self._size += 1
+            if idle is None:
+                return self._open()
+            if self._healthy(*idle):
+                return idle[0]
+            self._discard(idle[0])
+
+    def putconn(self, c, discard=False):
+        """Return a borrowed connection; broken ones are closed instead of reused"""
+        if not discard and not c.closed:
+            status = c.get_transaction_status()
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    c.rollback()
+                except psycopg2.Error:
+                    discard = True
+        with self._cond:
+            keep = not (discard or c.closed or self._closed)
+            if keep:
+                self._idle.append((c, self._opened_at.get(id(c), time.monotonic()), time.monotonic()))
+                self._cond.notify()
+        if not keep:
+            self._discard(c)
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Borrow a connection for a block: commit on success, roll back on error"""
+        c = self.getconn()
+        try:
+            yield c
+            c.commit()
+        except BaseException:
+            try:
+                c.rollback()
+            except psycopg2.Error:
+                self.putconn(c, discard=True)
+                raise
+            self.putconn(c)
+            raise
+        self.putconn(c)
+
+    def stats(self):
+        """Pool size, usage and wait counters"""
+        with self._cond:
+            return dict(
+                self._stats,
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                maxconn=self.maxconn,
+            )
+
+    def close(self):
+        """Close idle connections; borrowed ones are closed when returned"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for c, _, _ in idle:
+            self._discard(c)
 
-    c.commit()
-    c.close()
 
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    The process-wide pool, created on first use from ETL_DB_POOL_* settings.
+
+    A forked worker gets its own pool: connections are never shared across
+    processes.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool(
+                    minconn=int(os.getenv("ETL_DB_POOL_MIN", 1)),
+                    maxconn=int(os.getenv("ETL_DB_POOL_MAX", 10)),
+                    timeout=float(os.getenv("ETL_DB_POOL_TIMEOUT", 30)),
+                    check_idle=float(os.getenv("ETL_DB_POOL_CHECK_IDLE", 30)),
+                    recycle=float(os.getenv("ETL_DB_POOL_RECYCLE", 1800)),
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def connection():
+    """Borrow a pooled connection: `with connection() as c: ...`"""
+    return get_pool().connection()
+
+
+def pool_stats():
+    """Stats of this process's pool (zeros before first use)"""
+    if _pool is None or _pool_pid != os.getpid():
+        return {}
+    return _pool.stats()
+
+
+@atexit.register
+def close_pool():
+    """Close this process's pool"""
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
+        _pool = None
+
+
+def execute_insert(table, payload):
+    """Insert one row of column -> value; dict/list values are stored as JSON"""
+    columns = list(payload)
+    query = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
+        sql.Identifier(table),
+        sql.SQL(", ").join(map(sql.Identifier, columns)),
+        sql.SQL(", ").join(sql.Placeholder() * len(columns)),
+    )
+    values = [Json(v) if isinstance(v, (dict, list)) else v for v in payload.values()]
+    with connection() as c:
+        with c.cursor() as cur:
+            cur.execute(query, values)
+
+# Rows sent per COPY batch; bounds memory when loading a generator of posts
+COPY_CHUNK_ROWS = int(os.getenv("ETL_COPY_CHUNK_ROWS", 5000))
+
+
+class RawTable(NamedTuple):
+    """A raw_* table and the typed columns extracted from its payloads at load time"""
+    name: str
+    key_column: str
+    platform: str
+    # Typed columns, filled by extract(payload, account_id) in this order
+    columns: Sequence[str]
+    extract: Callable
+    # Columns holding (likes, comments, views); None where the platform has none
+    metric_columns: Sequence[Optional[str]]
+
+
+def _int(value):
+    return int(value) if value not in (None, "") else None
+
+
+def _instagram_columns(post, account_id):
+    return (
+        account_id,
+        post.get("caption"),
+        post.get("media_type"),
+        _int(post.get("like_count")),
+        _int(post.get("comments_count")),
+        post.get("timestamp"),
+    )
 
-def insert_youtube_raw(rows):
-    c = conn()
-    cur = c.cursor()
-    for r in rows :
+
+def _youtube_columns(item, account_id):
+    snippet = item.get("snippet") or {}
+    stats = item.get("statistics") or {}
+    item_id = item.get("id")
+    # Search results carry the kind on id ("youtube#video"), videos.list on the item
+    kind = item_id.get("kind", "") if isinstance(item_id, dict) else item.get("kind", "")
+    return (
+        account_id or snippet.get("channelId"),
+        snippet.get("title"),
+        kind.replace("youtube#", "") or None,
+        _int(stats.get("likeCount")),
+        _int(stats.get("commentCount")),
+        _int(stats.get("viewCount")),
+        snippet.get("publishedAt"),
+    )
+
+
+INSTAGRAM_RAW = RawTable(
+    "raw_instagram_posts", "post_id", "instagram",
+    ("account_id", "caption", "media_type", "like_count", "comments_count", "posted_at"),
+    _instagram_columns,
+    ("like_count", "comments_count", None),
+)
+
+YOUTUBE_RAW = RawTable(
+    "raw_youtube_stats", "video_id", "youtube",
+    ("account_id", "title", "media_type", "like_count", "comments_count", "view_count", "posted_at"),
+    _youtube_columns,
+    ("like_count", "comments_count", "view_count"),
+)
+
+
+def _metrics_sql(table, alias):
+    return ", ".join(f"{alias}.{c}" if c else "NULL::bigint" for c in table.metric_columns)
+
+
+def _serialize(payload):
+    """(raw_json, content_hash); keys are sorted so the hash ignores key order"""
+    raw_json = json.dumps(payload, sort_keys=True)
+    return raw_json, hashlib.sha256(raw_json.encode()).hexdigest()
+
+
+def _copy_chunks(table, rows, chunk_rows, account_id):
+    """Yield CSV buffers of at most chunk_rows staging rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for key, payload in rows:
+        writer.writerow((key, *_serialize(payload), *table.extract(payload, account_id)))
+        count += 1
+        if count == chunk_rows:
+            buffer.seek(0)
+            yield buffer
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            count = 0
+    if count:
+        buffer.seek(0)
+        yield buffer
+
+
+_snapshot_partitions = set()
+_snapshot_partitions_lock = threading.Lock()
+
+
+def ensure_snapshot_partition(day):
+    """Create the post_metric_snapshots partition for a UTC day if it is missing"""
+    if day in _snapshot_partitions:
+        return
+    with _snapshot_partitions_lock:
+        if day in _snapshot_partitions:
+            return
+        start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        query = sql.SQL("""
+        CREATE TABLE IF NOT EXISTS {} PARTITION OF post_metric_snapshots
+        FOR VALUES FROM ({}) TO ({});
+        """).format(
+            sql.Identifier(f"post_metric_snapshots_{day:%Y%m%d}"),
+            sql.Literal(start.isoformat()),
+            sql.Literal((start + timedelta(days=1)).isoformat()),
+        )
+        try:
+            with connection() as c:
+                c.cursor().execute(query)
+        except (psycopg2.errors.DuplicateTable, psycopg2.errors.UniqueViolation):
+            pass  # created concurrently by another process
+        _snapshot_partitions.add(day)
+
+
+def _upsert_set(table):
+    """SET assignments of the typed columns; a load without account_id keeps the stored one"""
+    return [
+        f"{c} = COALESCE(EXCLUDED.{c}, {table.name}.{c})" if c == "account_id" else f"{c} = EXCLUDED.{c}"
+        for c in table.columns
+    ]
+
+
+def bulk_load_raw(table, rows, chunk_rows=None, account_id=None):
+    """
+    Load (key, payload) rows into a raw_* table in one transaction.
+
+    Rows are streamed with COPY FROM STDIN into a temporary staging table in
+    chunks of chunk_rows, with the table's typed columns extracted from each
+    payload. A row is written only when it is new, its content hash
+    changed or it gains an account_id, and posts whose metrics differ from
+    the stored row get a row in post_metric_snapshots. Returns the number of
+    new or changed rows.
+    """
+    columns = ", ".join(table.columns)
+    chunk_rows = chunk_rows or COPY_CHUNK_ROWS
+    observed_at = datetime.now(timezone.utc)
+    ensure_snapshot_partition(observed_at.date())
+    with connection() as c:
+        cur = c.cursor()
+        # Same column types as the target table
+        cur.execute(f"""
+        CREATE TEMP TABLE raw_stage ON COMMIT DROP AS
+        SELECT {table.key_column} AS key, raw_json::text AS raw_json, content_hash, {columns}
+        FROM {table.name} WITH NO DATA;
+        """)
+        for chunk in _copy_chunks(table, rows, chunk_rows, account_id):
+            cur.copy_expert(
+                f"COPY raw_stage (key, raw_json, content_hash, {columns}) FROM STDIN WITH (FORMAT csv)",
+                chunk
+            )
+        # Compare against the stored payloads before they are overwritten
+        cur.execute(f"""
+        INSERT INTO post_metric_snapshots (platform, post_id, observed_at, likes, comments, views)
+        SELECT %s, s.key, %s, {_metrics_sql(table, "s")}
+        FROM (SELECT DISTINCT ON (key) * FROM raw_stage ORDER BY key) s
+        LEFT JOIN {table.name} t ON t.{table.key_column} = s.key
+        WHERE t.content_hash IS DISTINCT FROM s.content_hash
+          AND COALESCE({_metrics_sql(table, "s")}) IS NOT NULL
+          AND ({_metrics_sql(table, "s")}) IS DISTINCT FROM ({_metrics_sql(table, "t")});
+        """, (table.platform, observed_at))
+        cur.execute(f"""
+        INSERT INTO {table.name} ({table.key_column}, raw_json, content_hash, loaded_at, {columns})
+        SELECT DISTINCT ON (key) key, raw_json::jsonb, content_hash, %s, {columns}
+        FROM raw_stage ORDER BY key
+        ON CONFLICT({table.key_column}) DO UPDATE
+        SET raw_json = EXCLUDED.raw_json, content_hash = EXCLUDED.content_hash, loaded_at = EXCLUDED.loaded_at,
+            {", ".join(_upsert_set(table))}
+        WHERE {table.name}.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+           -- Also repairs rows loaded before the owning account was recorded
+           OR (EXCLUDED.account_id IS NOT NULL AND {table.name}.account_id IS DISTINCT FROM EXCLUDED.account_id);
+        """, (observed_at,))
+        return cur.rowcount
+
+
+def youtube_video_id(item):
+    """Video ID of a YouTube API item (search results nest it as id.videoId)"""
+    item_id = item.get("id")
+    if isinstance(item_id, dict):
+        return item_id.get("videoId")
+    return item_id
+
+
+def insert_instagram_raw(posts, chunk_rows=None, account_id=None):
+    # Media payloads do not name their owner, so the caller passes the account
+    return bulk_load_raw(
+        INSTAGRAM_RAW,
+        ((p["id"], p) for p in posts),
+        chunk_rows=chunk_rows,
+        account_id=account_id
+    )
+
+
+def insert_youtube_raw(rows, chunk_rows=None, account_id=None):
+    # Search results may include channels/playlists, which have no videoId
+    return bulk_load_raw(
+        YOUTUBE_RAW,
+        ((youtube_video_id(r), r) for r in rows if youtube_video_id(r)),
+        chunk_rows=chunk_rows,
+        account_id=account_id
+    )
+
+
+def get_watermark(platform, account_id):
+    """(last_seen_at, cursor) of the newest item loaded for an account, or (None, None)"""
+    with connection() as c:
+        cur = c.cursor()
         cur.execute("""
-        INSERT INTO raw_youtube_stats (video_id, raw_json)
-                VALUES (%s, %s)
-                ON CONFLICT(video_id) DO NOTHING;
-                """, (r["id"], json.dumps(r)))
+        SELECT last_seen_at, cursor FROM etl_watermarks
+        WHERE platform = %s AND account_id = %s;
+        """, (platform, account_id))
+        return cur.fetchone() or (None, None)
+
+
+def fetch_window(platform, account_id, full_refresh=False):
+    """
+    (since, cursor) to extract an account with: (None, None) re-reads everything.
+
+    Posts published in the ETL_REFETCH_DAYS before the watermark are fetched
+    again, so their metric changes reach the raw tables and
+    post_metric_snapshots. With ETL_REFETCH_DAYS=0 only newer posts are read.
+    """
+    if full_refresh:
+        return None, None
+    since, cursor = get_watermark(platform, account_id)
+    refetch_days = float(os.getenv("ETL_REFETCH_DAYS", 7))
+    if since is None or refetch_days <= 0:
+        return since, cursor
+    # No cursor: paging has to continue past the newest loaded post
+    return since - timedelta(days=refetch_days), None
+
 
-    c.commit()
-    c.close()
+def set_watermark(platform, account_id, last_seen_at, cursor):
+    """Record the newest loaded item; an older timestamp never moves the mark back"""
+    with connection() as c:
+        c.cursor().execute("""
+        INSERT INTO etl_watermarks (platform, account_id, last_seen_at, cursor)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (platform, account_id) DO UPDATE
+        SET last_seen_at = EXCLUDED.last_seen_at, cursor = EXCLUDED.cursor, updated_at = now()
+        WHERE EXCLUDED.last_seen_at >= etl_watermarks.last_seen_at;
+        """, (platform, account_id, last_seen_at, cursor))
 
+
+def refresh_predicted_best_times(platform):
+    """
+    Set post_analytics.predicted_best_time for a platform's accounts.
+
+    The prediction is the next occurrence (UTC) of the account's highest
+    scoring reliable cell in best_time_heatmap (built by dbt). Only rows whose
+    prediction changed are written. Returns the number of updated rows.
+    """
+    with connection() as c:
+        cur = c.cursor()
+        cur.execute("""
+        WITH best AS (
+          SELECT DISTINCT ON (account_id) account_id, weekday, hour
+          FROM best_time_heatmap
+          WHERE platform = %(platform)s AND is_reliable
+          ORDER BY account_id, score DESC, posts DESC
+        ),
+        slots AS (
+          SELECT
+            sa.id AS account_pk,
+            date_trunc('day', now() AT TIME ZONE 'UTC')
+              + ((b.weekday - extract(dow FROM now() AT TIME ZONE 'UTC')::int + 7) %% 7) * interval '1 day'
+              + b.hour * interval '1 hour' AS slot
+          FROM best b
+          JOIN social_accounts sa ON sa.platform = %(platform)s AND sa.account_id = b.account_id
+        ),
+        next_slots AS (
+          SELECT account_pk,
+            CASE WHEN slot <= now() AT TIME ZONE 'UTC' THEN slot + interval '7 days' ELSE slot END AS slot
+          FROM slots
+        )
+        UPDATE post_analytics pa
+        SET predicted_best_time = n.slot
+        FROM next_slots n
+        WHERE pa.account_id = n.account_pk
+          AND pa.predicted_best_time IS DISTINCT FROM n.slot;
+        """, {"platform": platform})
+        return cur.rowcount
@@ -1,9 +1,42 @@
-import requests
+from datetime import datetime
 
-def fetch_instagram_posts(user_id, token):
+from etl.helpers.rate_limit import limited_get
+
+def post_timestamp(post):
+    """Publication time of a post as an aware datetime"""
+    return datetime.strptime(post["timestamp"], "%Y-%m-%dT%H:%M:%S%z")
+
+def iter_instagram_posts(user_id, token, max_items=None, since=None, cursor=None):
+    """
+    Yield posts newest first, following `paging.next` one page at a time.
+
+    With a watermark (since: datetime of the newest loaded post, cursor: its
+    ID) only newer posts are requested, and paging stops at the first known
+    post.
+    """
     url = f"https://graph.facebook.com/v17.0/{user_id}/media"
     params = {
         "fields": "id,caption,media_type,like_count,comments_count,timestamp",
+        "limit": 100,
         "access_token": token
     }
-    return requests.get(url, params=params).json().get("data", [])
\ No newline at end of file
+    if since is not None:
+        params["since"] = int(since.timestamp())
+    yielded = 0
+    while url:
+        data = limited_get("instagram", token, url, params=params).json()
+        for post in data.get("data", []):
+            if cursor is not None and post["id"] == cursor:
+                return
+            if since is not None and post_timestamp(post) < since:
+                return
+            yield post
+            yielded += 1
+            if max_items is not None and yielded >= max_items:
+                return
+        # The next URL already carries the cursor and every query parameter
+        url = data.get("paging", {}).get("next")
+        params = None
+
+def fetch_instagram_posts(user_id, token, max_items=None, since=None, cursor=None):
+    return list(iter_instagram_posts(user_id, token, max_items=max_items, since=since, cursor=cursor))
@@ -0,0 +1,110 @@
+"""
+Synchronous client of the app's Redis token-bucket limiter for ETL calls.
+
+Uses the same bucket sizes, keys and Lua script as the API's limiter
+(backend/shared/rate_limits.py) so ETL and API traffic draw from one shared
+quota. ETL calls run at low priority: they leave RATE_LIMIT_ETL_RESERVE of
+every bucket to interactive requests, and simply sleep until quota is
+available.
+
+Requests go through one shared requests.Session per process, so concurrent
+ETL tasks reuse keep-alive connections (up to ETL_HTTP_POOL_SIZE per host).
+Every request has a timeout (ETL_HTTP_CONNECT_TIMEOUT / ETL_HTTP_TIMEOUT) so a
+stalled upstream fails the account instead of hanging the task.
+"""
+import logging
+import os
+import threading
+import time
+
+import redis
+import requests
+from shared.rate_limits import TOKEN_BUCKET_LUA, keys_and_args, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 5
+
+_client = None
+_script = None
+_redis_lock = threading.Lock()
+_http = None
+_http_lock = threading.Lock()
+
+
+def _redis():
+    """Process-wide Redis client shared by every ETL task and thread"""
+    global _client, _script
+    if _client is None:
+        with _redis_lock:
+            if _client is None:
+                client = redis.Redis(
+                    host=os.getenv("REDIS_HOST", "localhost"),
+                    port=int(os.getenv("REDIS_PORT", 6379)),
+                    db=int(os.getenv("REDIS_DB", 0)),
+                    decode_responses=True
+                )
+                _script = client.register_script(TOKEN_BUCKET_LUA)
+                # Published last so no thread sees the client without its script
+                _client = client
+    return _client
+
+
+def _session():
+    """Process-wide HTTP session shared by every ETL task and thread"""
+    global _http
+    if _http is None:
+        with _http_lock:
+            if _http is None:
+                pool_size = int(os.getenv("ETL_HTTP_POOL_SIZE", 32))
+                adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                _http = session
+    return _http
+
+
+def acquire(platform, token):
+    """Block until the ETL may make one call with this token"""
+    reserve = float(os.getenv("RATE_LIMIT_ETL_RESERVE", 0.2))
+    while True:
+        try:
+            client = _redis()
+            keys, args = keys_and_args(platform, token)
+            granted, wait = _script(keys=keys, args=[1, reserve] + args, client=client)
+        except redis.RedisError as e:
+            logger.warning("Rate limiter unavailable, allowing %s call: %s", platform, e)
+            return
+        if int(granted):
+            return
+        time.sleep(float(wait))
+
+
+def _timeout():
+    """(connect, read) timeout in seconds for ETL requests"""
+    return (
+        float(os.getenv("ETL_HTTP_CONNECT_TIMEOUT", 5)),
+        float(os.getenv("ETL_HTTP_TIMEOUT", 30)),
+    )
+
+
+def limited_get(platform, token, url, params=None):
+    """
+    GET on the shared session through the shared limiter, honouring Retry-After on 429.
+
+    Returns the final requests.Response (still 429 after MAX_RETRIES).
+    Raises requests.Timeout if the upstream does not answer in time.
+    """
+    for _ in range(MAX_RETRIES):
+        acquire(platform, token)
+        response = _session().get(url, params=params, timeout=_timeout())
+        if response.status_code != 429:
+            return response
+        seconds = retry_after_seconds(response.headers)
+        logger.warning("%s returned 429, backing off for %.0fs", platform, seconds)
+        try:
+            keys, _ = keys_and_args(platform, token)
+            _redis().set(keys[0], 1, px=int(seconds * 1000))
+        except redis.RedisError:
+            time.sleep(seconds)
+    return response
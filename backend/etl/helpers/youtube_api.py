@@ -1,7 +1,26 @@
-import requests
+from datetime import datetime, timezone
 
+from etl.helpers.rate_limit import limited_get
 
-def fetch_youtube_stats(channel_id, api_key):
+VIDEOS_URL = "https://www.googleapis.com/youtube/v3/videos"
+
+# videos.list accepts up to 50 IDs per call (1 quota unit per call)
+VIDEOS_PER_REQUEST = 50
+
+
+def published_at(item):
+    """Publication time of a search result as an aware datetime"""
+    return datetime.fromisoformat(item["snippet"]["publishedAt"].replace("Z", "+00:00"))
+
+
+def fetch_youtube_stats(channel_id, api_key, published_after=None, cursor=None):
+    """
+    Channel uploads newest first, following nextPageToken.
+
+    With a watermark (published_after: datetime of the newest loaded video,
+    cursor: its video ID) only newer videos are requested, and paging stops at
+    the first known video.
+    """
     url = "https://www.googleapis.com/youtube/v3/search"
     params = {
         "channelId": channel_id,
@@ -10,4 +29,51 @@ def fetch_youtube_stats(channel_id, api_key):
         "order": "date",
         "key": api_key
     }
-    return requests.get(url, params=params).json().get("items", [])
+    if published_after is not None:
+        params["publishedAfter"] = published_after.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    items = []
+    while True:
+        data = limited_get("youtube", api_key, url, params=params).json()
+        for item in data.get("items", []):
+            if cursor is not None and item.get("id", {}).get("videoId") == cursor:
+                return items
+            if published_after is not None and published_at(item) < published_after:
+                return items
+            items.append(item)
+        if not data.get("nextPageToken"):
+            return items
+        params = dict(params, pageToken=data["nextPageToken"])
+
+
+def enrich_video_stats(items, api_key):
+    """
+    Merge statistics and contentDetails into search results in place.
+
+    Video IDs are sent to videos.list 50 at a time, so a channel costs one
+    call per 50 videos instead of one per video. Items that are not videos
+    are left unchanged.
+
+    Returns:
+        The same items
+    """
+    by_id = {}
+    for item in items:
+        item_id = item.get("id")
+        if isinstance(item_id, dict) and item_id.get("videoId"):
+            by_id[item_id["videoId"]] = item
+    video_ids = list(by_id)
+    for start in range(0, len(video_ids), VIDEOS_PER_REQUEST):
+        batch = video_ids[start:start + VIDEOS_PER_REQUEST]
+        params = {
+            "id": ",".join(batch),
+            "part": "statistics,contentDetails",
+            "maxResults": VIDEOS_PER_REQUEST,
+            "key": api_key
+        }
+        data = limited_get("youtube", api_key, VIDEOS_URL, params=params).json()
+        for video in data.get("items", []):
+            item = by_id.get(video.get("id"))
+            if item is not None:
+                item["statistics"] = video.get("statistics", {})
+                item["contentDetails"] = video.get("contentDetails", {})
+    return items
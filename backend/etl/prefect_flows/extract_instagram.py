@@ -1,21 +1,33 @@
-from perfect import flow , task
-from etl.helpers.instagram_api import fetch_instagram_post
-from etl.helpers.db import insert_instagram_raw
+from prefect import flow , task
+from etl.helpers.instagram_api import fetch_instagram_posts, post_timestamp
+from etl.helpers.db import fetch_window, insert_instagram_raw, set_watermark
 
-@task
-def extract(user_id: str ,  access_token: str):
-    return fetch_instagram_post(user_id, access_token)
+
+def extract_and_load(user_id: str, access_token: str, full_refresh: bool = False):
+    """
+    Fetch one account's posts newer than its watermark (less the
+    ETL_REFETCH_DAYS re-fetch window, see fetch_window) and load them.
+
+    full_refresh ignores the watermark and re-reads every post. Returns the
+    number of new or changed rows.
+    """
+    since, cursor = fetch_window("instagram", user_id, full_refresh)
+    # Fetch before borrowing a DB connection so none is held during API calls
+    posts = fetch_instagram_posts(user_id, access_token, since=since, cursor=cursor)
+    inserted = insert_instagram_raw(posts, account_id=user_id)
+    if posts:
+        newest = max(posts, key=post_timestamp)
+        set_watermark("instagram", user_id, post_timestamp(newest), newest["id"])
+    return inserted
 
 @task
-def load(raw_data):
-    return insert_instagram_raw(raw_data)
+def load_account(user_id: str, access_token: str, full_refresh: bool = False):
+    return extract_and_load(user_id, access_token, full_refresh)
 
 @flow (name="extract_instagram_analysis")
-def extract_instagram_flow(user_id: str, tokens : str):
-    data = extract(user_id, tokens)
-    load(data)
-
+def extract_instagram_flow(user_id: str, tokens : str, full_refresh: bool = False):
+    return load_account(user_id, tokens, full_refresh)
 
 
 if __name__ == "__main__":
-    extract_instagram_flow()
\ No newline at end of file
+    extract_instagram_flow()
@@ -1,16 +1,30 @@
-from perfect import flow , task
-from etl.helpers.youtube_api import fetch_youtube_stats
-from etl.helpers.db import inset_youtube_raw
+from prefect import flow , task
+from etl.helpers.youtube_api import enrich_video_stats, fetch_youtube_stats, published_at
+from etl.helpers.db import fetch_window, insert_youtube_raw, set_watermark, youtube_video_id
 
-@task
-def extract(channel_id: str, api_key: str):
-    data = fetch_youtube_stats(channel_id, api_key)
+
+def extract_and_load(channel_id: str, api_key: str, full_refresh: bool = False):
+    """
+    Fetch one channel's videos newer than its watermark (less the
+    ETL_REFETCH_DAYS re-fetch window, see fetch_window) and load them.
+
+    full_refresh ignores the watermark and re-reads every video. Returns the
+    number of new or changed rows.
+    """
+    since, cursor = fetch_window("youtube", channel_id, full_refresh)
+    items = fetch_youtube_stats(channel_id, api_key, published_after=since, cursor=cursor)
+    enrich_video_stats(items, api_key)
+    inserted = insert_youtube_raw(items, account_id=channel_id)
+    videos = [item for item in items if youtube_video_id(item)]
+    if videos:
+        newest = max(videos, key=published_at)
+        set_watermark("youtube", channel_id, published_at(newest), youtube_video_id(newest))
+    return inserted
 
 @task
-def load(raw_data : dict):
-    return inset_youtube_raw(raw_data)
+def load_channel(channel_id: str, api_key: str, full_refresh: bool = False):
+    return extract_and_load(channel_id, api_key, full_refresh)
 
 @flow(name="Extract YouTube Analytics")
-def extract_youtube_flow(channel_id: str, key: str):
-    data = extract(channel_id, key)
-    load(data)
\ No newline at end of file
+def extract_youtube_flow(channel_id: str, key: str, full_refresh: bool = False):
+    return load_channel(channel_id, key, full_refresh)
@@ -1,4 +1,4 @@
-from perfect import task
+from prefect import task
 from etl.helpers.db import execute_insert
 
 @task
@@ -1,15 +1,212 @@
-from perfect import flow
-from etl.prefect_flows.extract_instagram import extract_instagram_flow
-from etl.prefect_flows.extract_youtube import extract_youtube_flow
-from etl.prefect_flows.run_dbt import dbt_flow
+"""
+Nightly ETL across every connected account.
+
+Each SocialAccount becomes one extract+load task run. Runs for different
+platforms proceed in parallel, each platform capped at
+ETL_CONCURRENCY_<PLATFORM> concurrent accounts (API quotas themselves are
+enforced by the shared Redis limiter). A failing account is logged and
+counted without affecting the others; the flow returns a per-platform timing
+summary.
+
+As soon as a platform's accounts are done, dbt builds the models downstream
+of that platform's raw source (if it received new or changed rows) while the
+other platforms keep extracting, then post_analytics.predicted_best_time is
+refreshed from the best_time_heatmap model.
+
+Extraction is incremental: each account only fetches content newer than its
+watermark (etl_watermarks). Run with full_refresh=True to re-read everything.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from prefect import flow, get_run_logger, task
+from etl.helpers.db import connection, pool_stats, refresh_predicted_best_times
+from etl.prefect_flows import extract_instagram, extract_youtube
+from etl.prefect_flows.run_dbt import SOURCES, DbtRunError, dbt_run
+
+# platform -> extract_and_load(account_id, credential, full_refresh)
+PLATFORMS = {
+    "instagram": extract_instagram.extract_and_load,
+    "youtube": extract_youtube.extract_and_load,
+}
+
+DEFAULT_CONCURRENCY = {"instagram": 8, "youtube": 4}
+
+SLOWEST_REPORTED = 5
+
+_executor = None
+
+
+def _concurrency(platform):
+    return int(os.getenv(f"ETL_CONCURRENCY_{platform.upper()}", DEFAULT_CONCURRENCY[platform]))
+
+
+def _worker_pool():
+    """Threads running the blocking extract+load calls, one per concurrency slot"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=sum(_concurrency(p) for p in PLATFORMS),
+            thread_name_prefix="etl-account",
+        )
+    return _executor
+
+
+def connected_accounts(platforms):
+    """(id, user_id, platform) of every connected account on the given platforms"""
+    with connection() as c:
+        cur = c.cursor()
+        cur.execute("""
+        SELECT id, user_id, platform FROM social_accounts
+        WHERE platform = ANY(%s)
+        ORDER BY id;
+        """, (list(platforms),))
+        return cur.fetchall()
+
+
+def _credentials(account_pk):
+    with connection() as c:
+        cur = c.cursor()
+        cur.execute("""
+        SELECT platform, account_id, access_token FROM social_accounts WHERE id = %s;
+        """, (account_pk,))
+        return cur.fetchone()
+
+
+def _extract_account(account_pk, full_refresh):
+    row = _credentials(account_pk)
+    if row is None:
+        return 0  # disconnected since the run started
+    platform, account_id, access_token = row
+    if platform == "youtube":
+        # Public channel uploads are read with the project's API key
+        access_token = os.getenv("YOUTUBE_API_KEY")
+    return PLATFORMS[platform](account_id, access_token, full_refresh)
+
+
+@task(name="extract_account")
+async def extract_account(account_pk: int, platform: str, full_refresh: bool = False):
+    # Only the primary key is passed so tokens never appear in task parameters
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_worker_pool(), _extract_account, account_pk, full_refresh)
+
+
+def _transform(platform):
+    # Separate target path per platform so run_results.json is not overwritten
+    timings = dbt_run([SOURCES[platform]], target_path=f"target/{platform}")
+    refresh_predicted_best_times(platform)
+    return timings
+
+
+@task(name="transform_platform")
+async def transform_platform(platform: str):
+    return await asyncio.get_running_loop().run_in_executor(None, _transform, platform)
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _summarize(results, elapsed):
+    summary = {"seconds": round(elapsed, 1), "platforms": {}, "slowest": []}
+    for platform in PLATFORMS:
+        runs = [r for r in results if r["platform"] == platform]
+        if not runs:
+            continue
+        seconds = [r["seconds"] for r in runs]
+        summary["platforms"][platform] = {
+            "accounts": len(runs),
+            "failed": sum(1 for r in runs if r["error"]),
+            "rows": sum(r["rows"] for r in runs),
+            "p50_seconds": round(_percentile(seconds, 0.5), 2),
+            "p95_seconds": round(_percentile(seconds, 0.95), 2),
+            "max_seconds": round(max(seconds), 2),
+        }
+    slowest = sorted(results, key=lambda r: r["seconds"], reverse=True)[:SLOWEST_REPORTED]
+    summary["slowest"] = [
+        {"account": r["account"], "platform": r["platform"], "seconds": round(r["seconds"], 2)}
+        for r in slowest
+    ]
+    summary["db_pool"] = pool_stats()
+    return summary
+
 
 @flow(name="Master Daily ETL")
-def master_etl():
-    extract_instagram_flow()
-    extract_youtube_flow()
-    dbt_flow()
+async def master_etl(platforms: Optional[list] = None, run_dbt: bool = True, full_refresh: bool = False):
+    logger = get_run_logger()
+    platforms = [p for p in (platforms or PLATFORMS) if p in PLATFORMS]
+    if "youtube" in platforms and not os.getenv("YOUTUBE_API_KEY"):
+        logger.warning("YOUTUBE_API_KEY is not set, skipping YouTube accounts")
+        platforms.remove("youtube")
+
+    accounts = connected_accounts(platforms)
+    logger.info("Extracting %d accounts%s", len(accounts), " (full refresh)" if full_refresh else "")
+    slots = {p: asyncio.Semaphore(_concurrency(p)) for p in platforms}
+
+    async def run(account_pk, user_id, platform):
+        async with slots[platform]:
+            started = time.perf_counter()
+            rows, error = 0, None
+            try:
+                rows = await extract_account(account_pk, platform, full_refresh)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                logger.error("%s account %s (user %s) failed: %s", platform, account_pk, user_id, error)
+            return {
+                "account": account_pk,
+                "platform": platform,
+                "rows": rows or 0,
+                "error": error,
+                "seconds": time.perf_counter() - started,
+            }
+
+    # Concurrent dbt runs would write the same marts, so they run one at a time
+    dbt_lock = asyncio.Lock()
+    transforms = {}
+    extract_seconds = {}
+
+    async def run_platform(platform):
+        started = time.perf_counter()
+        results = await asyncio.gather(*(run(*a) for a in accounts if a[2] == platform))
+        extract_seconds[platform] = time.perf_counter() - started
+        if not run_dbt:
+            return results
+        if not any(r["rows"] for r in results):
+            logger.info("No new %s rows, skipping dbt", platform)
+            return results
+        # Runs while other platforms are still extracting
+        async with dbt_lock:
+            try:
+                transforms[platform] = await transform_platform(platform)
+            except Exception as e:
+                logger.error("dbt for %s failed: %s", platform, e)
+                transforms[platform] = {"error": str(e)}
+        return results
+
+    started = time.perf_counter()
+    per_platform = await asyncio.gather(*(run_platform(p) for p in platforms))
+    results = [r for platform_results in per_platform for r in platform_results]
+    summary = _summarize(results, time.perf_counter() - started)
+    summary["dbt"] = transforms
+
+    for platform, stats in summary["platforms"].items():
+        stats["extract_seconds"] = round(extract_seconds[platform], 1)
+        logger.info(
+            "%s: %d accounts (%d failed) in %.1fs, %d new or changed rows, p50 %.2fs, p95 %.2fs, max %.2fs",
+            platform, stats["accounts"], stats["failed"], stats["extract_seconds"], stats["rows"],
+            stats["p50_seconds"], stats["p95_seconds"], stats["max_seconds"],
+        )
+    logger.info("ETL finished in %.1fs; slowest accounts: %s", summary["seconds"], summary["slowest"])
 
+    failed = [p for p, t in transforms.items() if isinstance(t, dict)]
+    if failed:
+        raise DbtRunError(f"dbt failed for {', '.join(failed)}")
+    return summary
 
 
 if __name__ == "__main__":
-    master_etl()
\ No newline at end of file
+    asyncio.run(master_etl())
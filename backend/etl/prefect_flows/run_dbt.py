@@ -1,16 +1,102 @@
-from perfect import task , flow
+"""
+dbt transformations for the ETL.
+
+dbt_run() builds only the models downstream of the given raw sources
+(`--select source:raw.<table>+`) with DBT_THREADS threads, checks the exit
+code and returns per-model timings parsed from run_results.json. Each
+invocation can use its own target path so concurrent or consecutive runs do
+not overwrite each other's artifacts.
+"""
+from prefect import task , flow, get_run_logger
+import json
+import logging
 import os
+import pathlib
 import subprocess
 
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = pathlib.Path(__file__).resolve().parents[1] / "dbt_project"
+
+# platform -> dbt source loaded by the ETL
+SOURCES = {
+    "instagram": "raw.raw_instagram_posts",
+    "youtube": "raw.raw_youtube_stats",
+}
+
+# Lines of dbt output kept in the error when a run fails
+OUTPUT_TAIL_LINES = 50
+
+
+class DbtRunError(RuntimeError):
+    """dbt exited with a non-zero status"""
+
+
+def dbt_command(sources=None, threads=None, target_path="target", full_refresh=False):
+    """dbt run arguments; sources=None builds every model"""
+    command = [
+        "dbt", "run",
+        "--profiles-dir", str(PROJECT_DIR),
+        "--target-path", target_path,
+        "--threads", str(threads or int(os.getenv("DBT_THREADS", 4))),
+    ]
+    if sources:
+        command += ["--select", *(f"source:{source}+" for source in sources)]
+    if full_refresh:
+        command.append("--full-refresh")
+    return command
+
+
+def model_timings(run_results_path):
+    """Per-model status, seconds and affected rows from a run_results.json"""
+    results = json.loads(pathlib.Path(run_results_path).read_text())["results"]
+    return [
+        {
+            "model": r["unique_id"].split(".")[-1],
+            "status": r["status"],
+            "seconds": round(r["execution_time"], 2),
+            "rows": (r.get("adapter_response") or {}).get("rows_affected"),
+        }
+        for r in results
+    ]
+
+
+def dbt_run(sources=None, threads=None, target_path="target", full_refresh=False):
+    """
+    Run dbt on the models downstream of sources.
+
+    Returns:
+        Per-model timings (see model_timings)
+
+    Raises:
+        DbtRunError: dbt failed; the message ends with its output
+    """
+    run_results = PROJECT_DIR / target_path / "run_results.json"
+    run_results.unlink(missing_ok=True)  # never report a previous run's results
+
+    command = dbt_command(sources, threads, target_path, full_refresh)
+    result = subprocess.run(command, cwd=PROJECT_DIR, capture_output=True, text=True)
+
+    timings = model_timings(run_results) if run_results.exists() else []
+    for timing in timings:
+        logger.info("dbt %s: %s in %.2fs (%s rows)", timing["model"], timing["status"], timing["seconds"], timing["rows"])
+
+    if result.returncode != 0:
+        tail = "\n".join((result.stdout + result.stderr).splitlines()[-OUTPUT_TAIL_LINES:])
+        raise DbtRunError(f"{' '.join(command)} exited with {result.returncode}:\n{tail}")
+    return timings
+
+
 @task
-def run_dbt():
-    return subprocess.run(
-        ["dbt" , "run"],
-        cwd = os.path.join(os.getcwd(), "etl/dbt_project"),
-    )
+def run_dbt(sources: list = None, threads: int = None, target_path: str = "target", full_refresh: bool = False):
+    timings = dbt_run(sources, threads, target_path, full_refresh)
+    get_run_logger().info("dbt built %d models in %.1fs", len(timings), sum(t["seconds"] for t in timings))
+    return timings
+
 @flow(name = "Run DBT Transformation")
-def dbt_flow():
-    run_dbt()
+def dbt_flow(platforms: list = None, threads: int = None, full_refresh: bool = False):
+    sources = [SOURCES[p] for p in platforms] if platforms else None
+    return run_dbt(sources, threads, full_refresh=full_refresh)
 
 if __name__ == "__main__":
     dbt_flow()
@@ -0,0 +1,117 @@
+"""
+Outbound Rate Limit Rules
+
+The parts of the token-bucket limiter that the API (app/core/rate_limit.py,
+asyncio) and the ETL (etl/helpers/rate_limit.py, synchronous) must agree on
+to share one quota in Redis: default bucket sizes, the Redis key layout, the
+Lua script and the backoff rules. Standard library only, so both can import
+it (the API as backend.shared.rate_limits, the ETL as shared.rate_limits).
+
+Configuration (environment variables):
+- RATE_LIMIT_<PLATFORM>_APP / RATE_LIMIT_<PLATFORM>_TOKEN: "<calls>/<seconds>"
+"""
+
+import hashlib
+import os
+import time
+from typing import Mapping, Optional
+
+# Default bucket sizes as (calls, per seconds)
+DEFAULT_LIMITS = {
+    "instagram": {"app": (4800, 3600), "token": (200, 3600)},
+    "twitter": {"app": (10000, 900), "token": (900, 900)},
+    "youtube": {"app": (10000, 86400), "token": (10000, 86400)},
+}
+
+# Backoff when a 429 carries no Retry-After / reset header
+DEFAULT_BACKOFF_SECONDS = 60
+
+# KEYS[1] = backoff key, KEYS[2..n] = bucket keys
+# ARGV[1] = tokens requested, ARGV[2] = reserve fraction,
+# then (capacity, refill per second) for each bucket key
+# Returns {1, "0"} when granted, {0, "<seconds to wait>"} otherwise
+TOKEN_BUCKET_LUA = """
+local blocked_ms = redis.call('PTTL', KEYS[1])
+if blocked_ms > 0 then
+  return {0, tostring(blocked_ms / 1000)}
+end
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local requested = tonumber(ARGV[1])
+local reserve = tonumber(ARGV[2])
+local levels = {}
+local wait = 0
+
+for i = 2, #KEYS do
+  local capacity = tonumber(ARGV[1 + (i - 1) * 2])
+  local rate = tonumber(ARGV[2 + (i - 1) * 2])
+  local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+  local tokens = tonumber(bucket[1]) or capacity
+  local ts = tonumber(bucket[2]) or now
+  tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+  levels[i] = tokens
+  local missing = requested + capacity * reserve - tokens
+  if missing > 0 then
+    wait = math.max(wait, missing / rate)
+  end
+end
+
+if wait > 0 then
+  return {0, tostring(wait)}
+end
+
+for i = 2, #KEYS do
+  local capacity = tonumber(ARGV[1 + (i - 1) * 2])
+  local rate = tonumber(ARGV[2 + (i - 1) * 2])
+  redis.call('HSET', KEYS[i], 'tokens', levels[i] - requested, 'ts', now)
+  redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 60)
+end
+return {1, "0"}
+"""
+
+
+def token_digest(access_token: str) -> str:
+    """Short, non-reversible identifier of an access token for Redis keys"""
+    return hashlib.sha256(access_token.encode()).hexdigest()[:16]
+
+
+def bucket_limit(platform: str, scope: str):
+    """(calls, seconds) of a platform's "app" or "token" bucket"""
+    value = os.getenv(f"RATE_LIMIT_{platform.upper()}_{scope.upper()}")
+    if value:
+        calls, seconds = value.split("/")
+        return int(calls), float(seconds)
+    return DEFAULT_LIMITS[platform][scope]
+
+
+def keys_and_args(platform: str, access_token: Optional[str]):
+    """
+    Redis keys and bucket arguments of TOKEN_BUCKET_LUA for one call
+
+    Returns:
+        (keys, args): keys[0] is the backoff key, then the app bucket and (with
+        an access token) the token's bucket; args holds (capacity, refill per
+        second) for each bucket
+    """
+    buckets = [(f"ratelimit:{platform}:app", bucket_limit(platform, "app"))]
+    if access_token:
+        buckets.append((f"ratelimit:{platform}:{token_digest(access_token)}", bucket_limit(platform, "token")))
+
+    backoff_key = f"ratelimit:{platform}:{token_digest(access_token) if access_token else 'app'}:backoff"
+    keys = [backoff_key] + [key for key, _ in buckets]
+    args = []
+    for _, (calls, seconds) in buckets:
+        args += [calls, calls / seconds]
+    return keys, args
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> float:
+    """Seconds to back off after a 429, from Retry-After or Twitter's x-rate-limit-reset"""
+    retry_after = headers.get("retry-after")
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    reset = headers.get("x-rate-limit-reset")
+    if reset and reset.isdigit():
+        return max(1.0, float(reset) - time.time())
+    return DEFAULT_BACKOFF_SECONDS
@@ -0,0 +1,125 @@
+"""
+ETL connection pool (etl/helpers/db.py ConnectionPool) under concurrent checkouts.
+
+Uses fake connections, so no database is needed. Run from the repository root:
+    python -m pytest backend/tests
+"""
+
+import pathlib
+import sys
+import threading
+import time
+
+import psycopg2.extensions
+
+# The ETL is imported as `etl.helpers...` from the backend directory
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from etl.helpers.db import ConnectionPool  # noqa: E402
+
+
+class FakeConnection:
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.closed = False
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.tracker.closed()
+
+
+class OpenTracker:
+    """Counts open fake connections and the peak number open at once"""
+
+    def __init__(self, connect_seconds=0.02, fail_first=0):
+        self.connect_seconds = connect_seconds
+        self.fail_first = fail_first
+        self.open = self.peak = self.attempts = 0
+        self.lock = threading.Lock()
+
+    def connect(self):
+        with self.lock:
+            self.attempts += 1
+            fail = self.attempts <= self.fail_first
+        # Slow connects widen the window between the size check and the connect
+        time.sleep(self.connect_seconds)
+        if fail:
+            raise psycopg2.OperationalError("connection refused")
+        with self.lock:
+            self.open += 1
+            self.peak = max(self.peak, self.open)
+        return FakeConnection(self)
+
+    def closed(self):
+        with self.lock:
+            self.open -= 1
+
+
+class YieldingCondition(threading.Condition):
+    """Pauses after every release so other threads run in the gaps between locked sections"""
+
+    def __exit__(self, *exc_info):
+        super().__exit__(*exc_info)
+        time.sleep(0.001)
+
+
+def _hammer(pool, threads=16, checkouts=5):
+    errors = []
+
+    start = threading.Barrier(threads)
+
+    def worker():
+        start.wait()
+        try:
+            for _ in range(checkouts):
+                with pool.connection():
+                    pass
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return errors
+
+
+def test_concurrent_checkouts_never_exceed_maxconn():
+    # Connections are only opened while the pool is cold, so start over many times
+    for _ in range(5):
+        tracker = OpenTracker(connect_seconds=0.002)
+        pool = ConnectionPool(minconn=0, maxconn=2, timeout=10, connect=tracker.connect)
+        pool._cond = YieldingCondition()
+
+        assert _hammer(pool, threads=16, checkouts=3) == []
+        assert tracker.peak <= 2
+        stats = pool.stats()
+        assert stats["size"] <= 2
+        assert stats["checkouts"] == 16 * 3
+        pool.close()
+        assert tracker.open == 0
+
+
+def test_failed_connect_releases_its_slot():
+    tracker = OpenTracker(fail_first=2)
+    pool = ConnectionPool(minconn=0, maxconn=2, timeout=10, connect=tracker.connect)
+
+    errors = _hammer(pool, threads=8, checkouts=3)
+
+    # Only the threads whose connect failed see an error; the rest get the freed slots
+    assert len(errors) == 2
+    assert all(isinstance(e, psycopg2.OperationalError) for e in errors)
+    assert tracker.peak <= 2
+    assert pool.stats()["size"] <= 2
+    pool.close()